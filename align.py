@@ -0,0 +1,112 @@
+from array import array
+
+from . import utils
+
+
+class NodeEdges:
+    """
+    Absolute edges of a set of nodes, measured once and stored as parallel columns.
+    The offsets are the flat x/y parent offsets of the nodes, see utils.NodeTable.
+    """
+
+    __slots__ = ("x", "y", "left", "center", "right", "bottom", "middle", "top")
+
+    def __init__(self, nodes, offsets):
+        self.x, self.y = array('f'), array('f')
+        self.left, self.center, self.right = array('f'), array('f'), array('f')
+        self.bottom, self.middle, self.top = array('f'), array('f'), array('f')
+
+        for index, node in enumerate(nodes):
+            offset_x, offset_y = offsets[2 * index], offsets[2 * index + 1]
+
+            self.x.append(node.location.x + offset_x)
+            self.y.append(node.location.y + offset_y)
+            self.left.append(utils.get_left(node) + offset_x)
+            self.center.append(utils.get_center(node) + offset_x)
+            self.right.append(utils.get_right(node) + offset_x)
+            self.bottom.append(utils.get_bottom(node) + offset_y)
+            self.middle.append(utils.get_middle(node) + offset_y)
+            self.top.append(utils.get_top(node) + offset_y)
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def bounds(self):
+        return min(self.left), max(self.right), min(self.bottom), max(self.top)
+
+    @property
+    def bounds_midpoint(self):
+        min_x, max_x, min_y, max_y = self.bounds
+        return 0.5 * (min_x + max_x), 0.5 * (min_y + max_y)
+
+
+def solve_align(edges, alignment):
+    """
+    Returns the new x and y columns of the measured nodes, so that the given edge of each node is aligned.
+    """
+
+    if len(edges) == 0:
+        return array('f'), array('f')
+
+    min_x, max_x, min_y, max_y = edges.bounds
+    midpoint_x, midpoint_y = edges.bounds_midpoint
+    x, y = edges.x, edges.y
+
+    if alignment == 'LEFT':
+        x = array('f', (xi + min_x - li for xi, li in zip(x, edges.left)))
+    elif alignment == 'CENTER':
+        x = array('f', (xi + midpoint_x - ci for xi, ci in zip(x, edges.center)))
+    elif alignment == 'RIGHT':
+        x = array('f', (xi + max_x - ri for xi, ri in zip(x, edges.right)))
+    elif alignment == 'TOP':
+        y = array('f', (yi + max_y - ti for yi, ti in zip(y, edges.top)))
+    elif alignment == 'MIDDLE':
+        y = array('f', (yi + midpoint_y - mi for yi, mi in zip(y, edges.middle)))
+    elif alignment == 'BOTTOM':
+        y = array('f', (yi + min_y - bi for yi, bi in zip(y, edges.bottom)))
+    else:
+        raise ValueError(f"'{alignment}' invalid value for parameter 'alignment'.")
+
+    return x, y
+
+
+def solve_distribute(edges, axis):
+    """
+    Returns the new x and y columns of the measured nodes, spread between the outermost edges
+    such that the gaps between them are equal.
+    """
+
+    count = len(edges)
+    x, y = array('f', edges.x), array('f', edges.y)
+
+    if count < 3:
+        return x, y
+
+    if axis == 'HORIZONTAL':
+        starts, ends, positions = edges.left, edges.right, x
+        order = sorted(range(count), key=starts.__getitem__)
+        direction = 1
+    elif axis == 'VERTICAL':
+        # Nodes are laid out from the top down, so the edges are negated to keep the same arithmetic
+        starts, ends, positions = array('f', (-t for t in edges.top)), array('f', (-b for b in edges.bottom)), y
+        order = sorted(range(count), key=starts.__getitem__)
+        direction = -1
+    else:
+        raise ValueError(f"'{axis}' invalid value for parameter 'axis'.")
+
+    span = max(ends) - starts[order[0]]
+    total_size = sum(e - s for s, e in zip(starts, ends))
+    gap = (span - total_size) / (count - 1)
+
+    cursor = starts[order[0]]
+    for index in order:
+        positions[index] += direction * (cursor - starts[index])
+        cursor += (ends[index] - starts[index]) + gap
+
+    return x, y
+
+
+def write_locations(nodes, x, y, offsets):
+    for index, (node, xi, yi) in enumerate(zip(nodes, x, y)):
+        node.location = (xi - offsets[2 * index], yi - offsets[2 * index + 1])
@@ -0,0 +1,328 @@
+"""
+Recording of node trees into a corpus of JSON files, and replaying of the straighten logic over them.
+
+A corpus file holds the nodes of a tree (location, parent index, size and collapsed state), their sockets
+(including the locations drawn by Blender at the time of recording) and the links between them, all keyed by
+integer index. Replaying rebuilds lightweight stand-ins for Blender's nodes, sockets and links from it, so the
+same StraightenJob code runs without the original file.
+
+Recording, from Blender's Python console:
+    corpus.export_tree(C.space_data.edit_tree, "/path/to/corpus/tree_name.json")
+
+Replaying, which also works in background mode:
+    blender -b --factory-startup --python-expr "import <addon>.corpus as c; c.main()" -- CORPUS_DIR GOLDEN_DIR [--update]
+
+Outside of Blender, tests/test_corpus.py replays the corpus in tests/corpus with pytest, using the stand-ins
+for Blender's modules in tests/stubs.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from mathutils import Vector
+
+from . import straighten, utils
+
+# Settings the golden files are recorded with. They are spelled out rather than taken from the add-on's defaults,
+# so that changing a default does not invalidate the golden files
+replay_preferences = utils.PreferencesSnapshot(
+    reposition_exceeding_reroutes=True,
+    reroute_padding=30,
+    apply_to='ALL',
+    resolve_ambiguous_reroutes='INPUT',
+    socket_location_source='DRAWN',
+    background_threshold=2000,
+    skip_global_undo=False,
+)
+
+# Trees are grouped by reroute count when comparing throughput. Trees below the first bucket straighten
+# in a few milliseconds at most, which is too short to time reliably, so they are only compared to their golden files
+size_buckets = (500, 5000, 50000)
+
+
+def get_size_bucket(count):
+    """
+    Returns the label of the size bucket a tree with the given number of reroutes is timed in,
+    or None if the tree is too small to be timed.
+    """
+
+    if count < size_buckets[0]:
+        return None
+
+    for lower, upper in zip(size_buckets, size_buckets[1:]):
+        if count < upper:
+            return f"{lower}-{upper}"
+
+    return f">={size_buckets[-1]}"
+
+
+def export_socket(sk):
+    is_drawn = utils.is_socket_drawn(sk)
+
+    return {
+        "identifier": sk.identifier,
+        "type": sk.type,
+        "enabled": sk.enabled,
+        "hide": sk.hide,
+        "hide_value": sk.hide_value,
+        "location": tuple(utils.get_socket_location(sk)) if is_drawn else None,
+    }
+
+
+def export_tree(node_tree, filepath):
+    node_indices = {node.as_pointer(): index for index, node in enumerate(node_tree.nodes)}
+    nodes = []
+
+    for node in node_tree.nodes:
+        nodes.append({
+            "name": node.name,
+            "bl_idname": node.bl_idname,
+            "location": tuple(node.location),
+            "parent": -1 if node.parent is None else node_indices[node.parent.as_pointer()],
+            "width": node.width,
+            "dimensions": tuple(node.dimensions),
+            "hide": node.hide,
+            "inputs": [export_socket(sk) for sk in node.inputs],
+            "outputs": [export_socket(sk) for sk in node.outputs],
+        })
+
+    socket_indices = {}
+    for index, node in enumerate(node_tree.nodes):
+        for sockets in (node.inputs, node.outputs):
+            for socket_index, sk in enumerate(sockets):
+                socket_indices[sk.as_pointer()] = (index, socket_index)
+
+    links = [
+        (*socket_indices[link.from_socket.as_pointer()], *socket_indices[link.to_socket.as_pointer()])
+        for link in node_tree.links
+    ]
+
+    with open(filepath, "w") as file:
+        json.dump({"name": node_tree.name, "nodes": nodes, "links": links}, file)
+
+
+class CorpusSocket:
+    __slots__ = ("node", "identifier", "name", "type", "enabled", "hide", "hide_value", "is_output", "location", "links")
+
+    def __init__(self, node, data, is_output):
+        self.node = node
+        self.identifier = self.name = data["identifier"]
+        self.type = data["type"]
+        self.enabled = data["enabled"]
+        self.hide = data["hide"]
+        self.hide_value = data["hide_value"]
+        self.is_output = is_output
+        self.location = None if data["location"] is None else Vector(data["location"])
+        self.links = []
+
+    @property
+    def is_linked(self):
+        return bool(self.links)
+
+    def as_pointer(self):
+        return id(self)
+
+
+class CorpusLink:
+    __slots__ = ("from_socket", "to_socket")
+
+    def __init__(self, from_socket, to_socket):
+        self.from_socket = from_socket
+        self.to_socket = to_socket
+
+    @property
+    def from_node(self):
+        return self.from_socket.node
+
+    @property
+    def to_node(self):
+        return self.to_socket.node
+
+
+class CorpusNode:
+    __slots__ = ("name", "bl_idname", "location", "parent", "width", "dimensions", "hide", "select", "inputs", "outputs")
+
+    def __init__(self, data):
+        self.name = data["name"]
+        self.bl_idname = data["bl_idname"]
+        self.location = Vector(data["location"])
+        self.parent = None
+        self.width = data["width"]
+        self.dimensions = Vector(data["dimensions"])
+        self.hide = data["hide"]
+        self.select = False
+        self.inputs = [CorpusSocket(self, sk, False) for sk in data["inputs"]]
+        self.outputs = [CorpusSocket(self, sk, True) for sk in data["outputs"]]
+
+    @property
+    def bl_static_type(self):
+        return "REROUTE" if self.bl_idname == "NodeReroute" else "CUSTOM"
+
+    def as_pointer(self):
+        return id(self)
+
+
+class CorpusTree:
+    __slots__ = ("name", "nodes", "links")
+
+    def __init__(self, data):
+        self.name = data["name"]
+        self.nodes = [CorpusNode(node) for node in data["nodes"]]
+        self.links = []
+
+        for node, node_data in zip(self.nodes, data["nodes"]):
+            if (parent := node_data["parent"]) != -1:
+                node.parent = self.nodes[parent]
+
+        for from_node, from_socket, to_node, to_socket in data["links"]:
+            link = CorpusLink(self.nodes[from_node].outputs[from_socket], self.nodes[to_node].inputs[to_socket])
+            link.from_socket.links.append(link)
+            link.to_socket.links.append(link)
+            self.links.append(link)
+
+    def as_pointer(self):
+        return id(self)
+
+    @classmethod
+    def load(cls, filepath):
+        with open(filepath) as file:
+            return cls(json.load(file))
+
+
+class RecordedStraightenJob(straighten.StraightenJob):
+    def read_socket_location(self, socket):
+        return (0.0, 0.0) if socket.location is None else tuple(socket.location)
+
+
+def replay_tree(tree, prefs=None, *, repeats=1):
+    """
+    Straightens a CorpusTree with the recorded socket locations, returning the plan and the time it took in seconds.
+    The tree is straightened the given number of times, keeping the fastest time, which is the least affected by noise.
+    """
+
+    if prefs is None:
+        prefs = replay_preferences
+
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        plan = straighten.plan_straighten(tree, prefs, job_type=RecordedStraightenJob)
+        timings.append(time.perf_counter() - start)
+
+    return plan, min(timings)
+
+
+def compare_positions(plan, golden, tolerance):
+    """
+    Returns the largest distance between the planned positions and the golden ones, along with
+    the names of the reroutes that are missing from either.
+    """
+
+    expected = {r["name"]: r["new"] for r in golden["reroutes"]}
+    actual = {r["name"]: r["new"] for r in plan.to_dict(moved_only=False)["reroutes"]}
+    mismatched_names = sorted(expected.keys() ^ actual.keys())
+
+    max_error = 0.0
+    for name in expected.keys() & actual.keys():
+        (x1, y1), (x2, y2) = expected[name], actual[name]
+        max_error = max(max_error, abs(x1 - x2), abs(y1 - y2))
+
+    return max_error, mismatched_names
+
+
+def compare_throughput(throughput, baseline, max_slowdown):
+    """
+    Returns a failure message for every size bucket whose throughput fell below its baseline by more than max_slowdown.
+    """
+
+    return [
+        f"bucket {bucket}: throughput fell to {value:.0f} reroutes/s from a baseline of {baseline[bucket]:.0f}"
+        for bucket, value in throughput.items()
+        if bucket in baseline and value * max_slowdown < baseline[bucket]
+    ]
+
+
+def run_corpus(corpus_dir, golden_dir, *, tolerance=1e-3, max_slowdown=1.25, repeats=5, update=False):
+    """
+    Replays every tree of the corpus and compares the results to the golden files of the same name.
+    Throughput (reroutes per second) is summed per size bucket and compared to the recorded baseline.
+
+    Args:
+        tolerance (optional): Largest allowed difference of any coordinate from the golden positions
+        max_slowdown (optional): Factor by which a bucket's throughput may fall below its baseline.
+            None skips the comparison, as baselines only hold on the machine they were recorded on
+        repeats (optional): Number of times each tree is replayed, keeping its fastest time
+        update (optional): Write the current results as the new golden files and baselines instead of comparing
+
+    Returns:
+        A list of failure messages, empty if every tree passed
+    """
+
+    failures = []
+    buckets = {}
+
+    for filename in sorted(os.listdir(corpus_dir)):
+        if not filename.endswith(".json"):
+            continue
+
+        tree = CorpusTree.load(os.path.join(corpus_dir, filename))
+        plan, seconds = replay_tree(tree, repeats=repeats)
+
+        if (bucket := get_size_bucket(len(plan))) is not None:
+            reroutes, total_seconds = buckets.get(bucket, (0, 0.0))
+            buckets[bucket] = (reroutes + len(plan), total_seconds + seconds)
+
+        golden_path = os.path.join(golden_dir, filename)
+        if update:
+            with open(golden_path, "w") as file:
+                json.dump(plan.to_dict(moved_only=False), file, indent=1)
+            continue
+
+        if not os.path.exists(golden_path):
+            failures.append(f"{filename}: missing golden file")
+            continue
+
+        with open(golden_path) as file:
+            max_error, mismatched_names = compare_positions(plan, json.load(file), tolerance)
+
+        if mismatched_names:
+            failures.append(f"{filename}: reroutes differ from golden file: {', '.join(mismatched_names)}")
+        if max_error > tolerance:
+            failures.append(f"{filename}: positions deviate by up to {max_error:.4f} (tolerance {tolerance})")
+
+    throughput = {bucket: count / max(seconds, 1e-9) for bucket, (count, seconds) in buckets.items()}
+    timings_path = os.path.join(golden_dir, "timings.json")
+
+    if update:
+        with open(timings_path, "w") as file:
+            json.dump(throughput, file, indent=1)
+    elif max_slowdown is not None and os.path.exists(timings_path):
+        with open(timings_path) as file:
+            failures.extend(compare_throughput(throughput, json.load(file), max_slowdown))
+
+    return failures
+
+
+def main():
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+
+    parser = argparse.ArgumentParser(description="Replay the straighten logic over a recorded node tree corpus")
+    parser.add_argument("corpus_dir")
+    parser.add_argument("golden_dir")
+    parser.add_argument("--tolerance", type=float, default=1e-3)
+    parser.add_argument("--max-slowdown", type=float, default=1.25)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--update", action="store_true", help="Record the current results as golden files")
+    args = parser.parse_args(argv)
+
+    failures = run_corpus(
+        args.corpus_dir, args.golden_dir,
+        tolerance=args.tolerance, max_slowdown=args.max_slowdown, repeats=args.repeats, update=args.update)
+
+    for failure in failures:
+        print(failure)
+
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,359 @@
+import heapq
+import math
+import random
+
+from fractions import Fraction
+
+
+def orientation(ax, ay, bx, by, cx, cy):
+    return (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+
+
+def to_integer_segments(segments):
+    """
+    Scales the coordinates of the segments to integers, without any loss. Floats are binary fractions,
+    so scaling them all by the largest of their denominators is exact, and keeps the arithmetic on integers.
+    """
+
+    ratios = [tuple(float(v).as_integer_ratio() for v in segment) for segment in segments]
+    scale = max((d for segment in ratios for _, d in segment), default=1)
+
+    return [tuple(n * (scale // d) for n, d in segment) for segment in ratios]
+
+
+def get_crossing_point(a, b):
+    """
+    Returns the point where the segments properly cross, or None if they do not.
+    The point is exact as long as the coordinates are integers.
+    """
+
+    ax1, ay1, ax2, ay2 = a
+    bx1, by1, bx2, by2 = b
+
+    o1 = orientation(ax1, ay1, ax2, ay2, bx1, by1)
+    o2 = orientation(ax1, ay1, ax2, ay2, bx2, by2)
+    o3 = orientation(bx1, by1, bx2, by2, ax1, ay1)
+    o4 = orientation(bx1, by1, bx2, by2, ax2, ay2)
+
+    if (o1 * o2 >= 0) or (o3 * o4 >= 0):
+        return None
+
+    t = Fraction(o3, o3 - o4)
+    return ax1 + t * (ax2 - ax1), ay1 + t * (ay2 - ay1)
+
+
+class StatusNode:
+    """
+    Node of the treap holding the sweep line status, ordered from the bottom up.
+    """
+
+    __slots__ = ("segment", "priority", "left", "right")
+
+    def __init__(self, segment):
+        self.segment = segment
+        self.priority = random.random()
+        self.left = self.right = None
+
+
+def split_status(node, is_before):
+    """
+    Splits the treap into the nodes whose segment satisfies is_before, which must all come first, and the others.
+    """
+
+    if node is None:
+        return None, None
+
+    if is_before(node.segment):
+        node.right, right = split_status(node.right, is_before)
+        return node, right
+    else:
+        left, node.left = split_status(node.left, is_before)
+        return left, node
+
+
+def merge_status(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+
+    if a.priority > b.priority:
+        a.right = merge_status(a.right, b)
+        return a
+    else:
+        b.left = merge_status(a, b.left)
+        return b
+
+
+def iter_status(node):
+    stack = []
+    while stack or node is not None:
+        while node is not None:
+            stack.append(node)
+            node = node.left
+
+        node = stack.pop()
+        yield node.segment
+        node = node.right
+
+
+def get_outermost_segment(node, side):
+    if node is None:
+        return None
+
+    while (child := getattr(node, side)) is not None:
+        node = child
+
+    return node.segment
+
+
+def count_crossings(segments):
+    """
+    Counts the pairs of properly crossing segments with a Bentley-Ottmann sweep, in expected O((n + k) log n) for n segments
+    with k crossing points, rather than testing every pair.
+
+    As in the original algorithm, every segment passing through an event point is handled at once, so any number
+    of segments may cross at the same point. Coordinates are scaled to integers first, so that crossing points are exact
+    and the segments meeting at a point are found reliably. Segments that only touch or overlap do not count as crossing.
+
+    Args:
+        segments : Iterable of (x1, y1, x2, y2) tuples
+    """
+
+    segments = [
+        (x1, y1, x2, y2) if (x1, y1) <= (x2, y2) else (x2, y2, x1, y1)
+        for x1, y1, x2, y2 in to_integer_segments(segments)
+        if (x1, y1) != (x2, y2)
+    ]
+
+    def get_side(index, point):
+        # Positive when the point lies above the segment, zero when it lies on it
+        x1, y1, x2, y2 = segments[index]
+        return orientation(x1, y1, x2, y2, *point)
+
+    def get_slope_key(index):
+        # Orders segments leaving the same point from the bottom up, vertical segments coming last
+        x1, y1, x2, y2 = segments[index]
+        return (1, 0) if x1 == x2 else (0, Fraction(y2 - y1, x2 - x1))
+
+    # Events are (x, y, segment) tuples, where the segment starts at the point, or is -1 for any other event
+    events = [(x1, y1, index) for index, (x1, y1, x2, y2) in enumerate(segments)]
+    events.extend((x2, y2, -1) for x1, y1, x2, y2 in segments)
+    heapq.heapify(events)
+
+    def add_crossing(lower, upper, point):
+        if lower is None or upper is None:
+            return
+
+        crossing = get_crossing_point(segments[lower], segments[upper])
+        if crossing is not None and crossing > point:
+            heapq.heappush(events, (*crossing, -1))
+
+    status = None
+    count = 0
+
+    while events:
+        x, y, index = heapq.heappop(events)
+        point = (x, y)
+        starting = [] if index == -1 else [index]
+
+        while events and events[0][:2] == point:
+            if (index := heapq.heappop(events)[2]) != -1:
+                starting.append(index)
+
+        below, rest = split_status(status, lambda i: get_side(i, point) > 0)
+        through, above = split_status(rest, lambda i: get_side(i, point) == 0)
+
+        # Segments passing through the point, leaving out the ones that end there
+        passing = [i for i in iter_status(through) if segments[i][2:] != point]
+
+        slopes = {}
+        for i in passing:
+            slope = get_slope_key(i)
+            slopes[slope] = slopes.get(slope, 0) + 1
+
+        # Every pair of segments passing through the point crosses there, unless they overlap
+        count += len(passing) * (len(passing) - 1) // 2
+        count -= sum(n * (n - 1) // 2 for n in slopes.values())
+
+        leaving = sorted(passing + starting, key=get_slope_key)
+        middle = None
+        for i in leaving:
+            middle = merge_status(middle, StatusNode(i))
+
+        lower, upper = get_outermost_segment(below, "right"), get_outermost_segment(above, "left")
+        status = merge_status(below, merge_status(middle, above))
+
+        if leaving:
+            add_crossing(lower, leaving[0], point)
+            add_crossing(leaving[-1], upper, point)
+        else:
+            add_crossing(lower, upper, point)
+
+    return count
+
+
+class RerouteLinks:
+    """
+    Links touching a set of reroutes. Each endpoint is either the index of a reroute, whose position
+    is looked up when building segments, or the fixed location of a socket.
+    """
+
+    __slots__ = ("endpoints",)
+
+    def __init__(self):
+        self.endpoints = []
+
+    def __len__(self):
+        return len(self.endpoints)
+
+    def add(self, start, end):
+        self.endpoints.append((start, end))
+
+    @staticmethod
+    def resolve(endpoint, positions):
+        if isinstance(endpoint, int):
+            return positions[2 * endpoint], positions[2 * endpoint + 1]
+        return endpoint
+
+    def segments(self, positions, link_indices=None):
+        if link_indices is None:
+            link_indices = range(len(self))
+
+        resolve = self.resolve
+        return [(*resolve(self.endpoints[i][0], positions), *resolve(self.endpoints[i][1], positions)) for i in link_indices]
+
+    def reroute_edges(self):
+        for start, end in self.endpoints:
+            if isinstance(start, int) and isinstance(end, int):
+                yield start, end
+
+
+class LinkIndex:
+    """
+    Buckets links by the horizontal cells their segments span, to find the links around a region without
+    going through all of them. Trunks are only ever moved vertically, so the buckets stay valid while reordering.
+    """
+
+    __slots__ = ("cell_size", "cells")
+
+    def __init__(self, segments):
+        extents = sorted(abs(x2 - x1) for x1, _, x2, _ in segments)
+        # Most links then span one or two cells
+        self.cell_size = max(extents[len(extents) // 2], 1.0) if extents else 1.0
+        self.cells = {}
+
+        for link_index, (x1, _, x2, _) in enumerate(segments):
+            for cell in range(self.get_cell(min(x1, x2)), self.get_cell(max(x1, x2)) + 1):
+                self.cells.setdefault(cell, []).append(link_index)
+
+    def get_cell(self, x):
+        return math.floor(x / self.cell_size)
+
+    def query(self, min_x, max_x):
+        found = set()
+        for cell in range(self.get_cell(min_x), self.get_cell(max_x) + 1):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+
+def get_trunk_span(trunk, positions):
+    xs = [positions[2 * i] for i in trunk]
+    ys = [positions[2 * i + 1] for i in trunk]
+    return min(xs), max(xs), sum(ys) / len(ys)
+
+
+def get_segment_bounds(segments):
+    return (
+        min(min(s[0], s[2]) for s in segments),
+        max(max(s[0], s[2]) for s in segments),
+        min(min(s[1], s[3]) for s in segments),
+        max(max(s[1], s[3]) for s in segments),
+    )
+
+
+def reorder_trunks(links, positions, trunks, *, max_passes=4):
+    """
+    Swaps the heights of neighbouring trunks (chains of reroutes) whose horizontal extents overlap,
+    keeping only the swaps that reduce the number of crossing links.
+
+    Args:
+        links : RerouteLinks between the reroutes and their sockets
+        positions : Flat x/y array of the reroute positions, which is updated in place
+        trunks : Sequences of reroute indices, each moved as a whole
+
+    Returns:
+        The number of crossings before and after reordering
+    """
+
+    trunk_links = [set() for _ in trunks]
+    trunk_of = {index: t for t, trunk in enumerate(trunks) for index in trunk}
+
+    for link_index, (start, end) in enumerate(links.endpoints):
+        for endpoint in (start, end):
+            if isinstance(endpoint, int):
+                trunk_links[trunk_of[endpoint]].add(link_index)
+
+    def swap(lower, upper, offset):
+        for index in trunks[lower]:
+            positions[2 * index + 1] += offset
+        for index in trunks[upper]:
+            positions[2 * index + 1] -= offset
+
+    def get_heights(lower, upper):
+        return [(index, positions[2 * index + 1]) for index in (*trunks[lower], *trunks[upper])]
+
+    def set_heights(heights):
+        # Undoing a swap by moving back by the same offset does not round back to the same float32 values
+        for index, y in heights:
+            positions[2 * index + 1] = y
+
+    def get_nearby_links(bounds):
+        min_x, max_x, min_y, max_y = bounds
+        candidates = sorted(links_by_x.query(min_x, max_x))
+
+        return [
+            i for i, (x1, y1, x2, y2) in zip(candidates, links.segments(positions, candidates))
+            if max(x1, x2) >= min_x and min(x1, x2) <= max_x and max(y1, y2) >= min_y and min(y1, y2) <= max_y
+        ]
+
+    segments = links.segments(positions)
+    links_by_x = LinkIndex(segments)
+    before = count_crossings(segments)
+
+    for _ in range(max_passes):
+        order = sorted(range(len(trunks)), key=lambda t: get_trunk_span(trunks[t], positions)[2])
+        has_swapped = False
+
+        for lower, upper in zip(order, order[1:]):
+            affected = sorted(trunk_links[lower] | trunk_links[upper])
+            if not affected:
+                continue
+
+            lower_min, lower_max, lower_y = get_trunk_span(trunks[lower], positions)
+            upper_min, upper_max, upper_y = get_trunk_span(trunks[upper], positions)
+            if lower_max < upper_min or upper_max < lower_min:
+                continue
+
+            # Only links around the two trunks, in either order, can gain or lose crossings from swapping them
+            offset = upper_y - lower_y
+            heights = get_heights(lower, upper)
+            current_segments = links.segments(positions, affected)
+            swap(lower, upper, offset)
+            swapped_segments = links.segments(positions, affected)
+            set_heights(heights)
+
+            nearby = get_nearby_links(get_segment_bounds(current_segments + swapped_segments))
+            current = count_crossings(links.segments(positions, nearby))
+            swap(lower, upper, offset)
+            swapped = count_crossings(links.segments(positions, nearby))
+
+            if swapped < current:
+                has_swapped = True
+            else:
+                set_heights(heights)
+
+        if not has_swapped:
+            break
+
+    return before, count_crossings(links.segments(positions))
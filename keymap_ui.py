@@ -1,7 +1,7 @@
 import bpy
 import itertools
 from dataclasses import dataclass
-from typing import Dict, Iterator, Tuple
+from typing import Dict, Iterable, Iterator, Tuple
 
 from bpy.types import AddonPreferences
 from bpy.props import BoolProperty
@@ -50,6 +50,32 @@ class KeymapItemDef:
             "head" : self.head
         }
 
+    @property
+    def hash_key(self) -> tuple:
+        """
+        Hashable key identifying the keymap item this definition describes, see keymap_item_key()
+        """
+
+        if self.any_modifier:
+            modifiers = (-1, -1, -1, -1)
+        else:
+            modifiers = (int(self.ctrl), int(self.shift), int(self.alt), int(self.oskey))
+
+        props = () if self.props is None else tuple(sorted(self.props.items()))
+        return (self.keymap_name, self.space_type, self.bl_idname, self.key_type, self.input_mode, modifiers, self.custom_modifier, props)
+
+
+def keymap_item_key(keymap, keymap_item, prop_names: Iterable[str]) -> tuple:
+    """
+    Builds the same key as KeymapItemDef.hash_key for an existing keymap item,
+    comparing only the given operator properties.
+    """
+
+    modifiers = (int(keymap_item.ctrl), int(keymap_item.shift), int(keymap_item.alt), int(keymap_item.oskey))
+    props = tuple(sorted((name, getattr(keymap_item.properties, name)) for name in prop_names))
+
+    return (keymap.name, keymap.space_type, keymap_item.idname, keymap_item.type, keymap_item.value, modifiers, keymap_item.key_modifier, props)
+
 
 class KeymapStructure():
     def __init__(self, structure:Dict[str, KeymapItemDef]) -> None:
@@ -100,19 +126,52 @@ class KeymapStructure():
         return itertools.groupby(kmi_defs, key=self.fetch_keymap_data)
 
     def register(self):
+        """
+        Adds the keymap items that are missing from the addon keyconfig, and removes stale or duplicate items
+        of the same operators. Registering several times, such as when reloading scripts, is therefore harmless.
+        """
+
         self.registered_keymaps.clear()
 
-        if key_config := bpy.context.window_manager.keyconfigs.addon:
-            for (km_name, km_space), kmi_defs in self.keymap_defs:
-                keymap = key_config.keymaps.new(name=km_name, space_type=km_space)
-                for definition in kmi_defs:
+        if not (key_config := bpy.context.window_manager.keyconfigs.addon):
+            return
+
+        wanted = {kmi_def.hash_key: kmi_def for kmi_def in self.keymap_items}
+        prop_names = {}
+        for kmi_def in wanted.values():
+            prop_names.setdefault(kmi_def.bl_idname, set()).update(kmi_def.props or ())
+
+        for (km_name, km_space), kmi_defs in self.keymap_defs:
+            keymap = key_config.keymaps.new(name=km_name, space_type=km_space)
+            existing = {}
+
+            for keymap_item in tuple(keymap.keymap_items):
+                if (names := prop_names.get(keymap_item.idname)) is None:
+                    continue
+
+                key = keymap_item_key(keymap, keymap_item, names)
+                if key in wanted and key not in existing:
+                    existing[key] = keymap_item
+                else:
+                    keymap.keymap_items.remove(keymap_item)
+
+            claimed = set()
+
+            for definition in kmi_defs:
+                if definition.hash_key in claimed:
+                    continue
+                claimed.add(definition.hash_key)
+
+                if (keymap_item := existing.get(definition.hash_key)) is None:
                     keymap_item = keymap.keymap_items.new(**definition.keymap_props)
 
                     if (props := definition.props) is not None:
                         for prop, value in props.items():
                             setattr(keymap_item.properties, prop, value)
 
-                    self.registered_keymaps.append((keymap, keymap_item))
+                    existing[definition.hash_key] = keymap_item
+
+                self.registered_keymaps.append((keymap, keymap_item))
 
     def unregister(self):
         for keymap, keymap_item in self.registered_keymaps:
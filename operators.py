@@ -1,16 +1,45 @@
 import bpy
 
+from array import array
 from bpy.types import Operator
 from bpy.props import EnumProperty, FloatProperty
 
-from . import utils
-from .utils import fetch_user_preferences
+from . import align, crossings, straighten, utils
+from .utils import fetch_preferences_snapshot, fetch_user_preferences
+
+# Time spent on each timer tick when straightening in the background, in seconds
+chunk_time_budget = 0.008
+navigation_events = {'MIDDLEMOUSE', 'WHEELUPMOUSE', 'WHEELDOWNMOUSE', 'TRACKPADPAN', 'TRACKPADZOOM'}
 
 # EnumProperties that are generated dynamically tend to misbehave as Python tends to clean up memory
 # Caching the results forces Python to keep track of the data while the operator is in use
 enum_callback_cache = []
 
 
+def fetch_targets(context, target):
+    # Only the selected nodes are walked when targeting them, which the context already has at hand
+    selected_nodes = None if target == 'ALL' else context.selected_nodes
+    return utils.fetch_node_table(context.space_data.edit_tree, target=target, selected_nodes=selected_nodes)
+
+
+def fetch_reroutes(context, prefs):
+    table, indices = fetch_targets(context, prefs.apply_to)
+    return table, array('i', (i for i in indices if table.is_reroute[i]))
+
+
+def is_node_tree_editor(context):
+    try:
+        space = context.space_data
+
+        is_existing = space.node_tree is not None
+        is_node_editor = space.type == "NODE_EDITOR"
+
+        return all((is_existing, is_node_editor))
+
+    except AttributeError:
+        return False
+
+
 def cache_enum_results(function):
     def wrapped_func(self, context):
         enum_callback_cache.clear()
@@ -21,11 +50,9 @@ def cache_enum_results(function):
     return wrapped_func
 
 
-class NODE_OT_straighten_reroutes(Operator):
-    bl_idname = "node.straighten_reroutes"
-    bl_label = "Straighten Reroutes"
-    bl_description = "Reposition reroutes such that the links they have to other nodes are straight"
-    bl_options = {"REGISTER", "UNDO"}
+class StraightenReroutesOperator:
+    # Whether the moved reroutes are recorded for 'Revert Last Straighten', for operators without a global undo step
+    record_deltas = False
 
     target_reroutes: EnumProperty(
         name="Target Reroutes",
@@ -39,101 +66,227 @@ class NODE_OT_straighten_reroutes(Operator):
 
     @classmethod
     def poll(cls, context):
-        try:
-            space = context.space_data
+        return is_node_tree_editor(context)
+
+    def invoke(self, context, event):
+        prefs = fetch_preferences_snapshot()
+        table, reroutes = fetch_reroutes(context, prefs)
+
+        if len(reroutes) < prefs.background_threshold:
+            return self.straighten(context, table, reroutes, prefs)
+
+        self._job = self.create_job(table, reroutes, prefs)
+        self._prefs = prefs
+        self._steps = self._job.steps()
+        self._progress = 0
+        self._tree_state = self.get_tree_state(context)
+
+        wm = context.window_manager
+        wm.progress_begin(0, max(self._job.total_steps, 1))
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        self._timer_duration = self._timer.time_duration
+        wm.modal_handler_add(self)
+
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            # Nothing is written back before the job is done, so there is nothing to roll back
+            self.finish(context)
+            self.report({'INFO'}, 'Cancelled straightening reroute links.')
+            return {"CANCELLED"}
 
-            is_existing = space.node_tree is not None
-            is_node_editor = space.type == "NODE_EDITOR"
+        if event.type == 'TIMER' and self.is_own_timer():
+            # The job holds on to the nodes it measures and writes to, which another window or an undo may have removed
+            # since the last tick. Checking before each tick also covers applying, which happens within the last one
+            if self.get_tree_state(context) != self._tree_state:
+                self.finish(context)
+                self.report({'WARNING'}, 'Nodes have changed while straightening, cancelled straightening reroute links.')
+                return {"CANCELLED"}
 
-            return all((is_existing, is_node_editor))
-        
-        except AttributeError:
-            return False
+            count, is_done = straighten.run_for(self._steps, chunk_time_budget)
+            self._progress = min(self._progress + count, self._job.total_steps)
+            context.window_manager.progress_update(self._progress)
+
+            if is_done:
+                self.apply(context, self._job)
+                self.finish(context)
+                return self.report_result(context, self._job, self._prefs)
+
+        if event.type in navigation_events:
+            return {"PASS_THROUGH"}
+
+        return {"RUNNING_MODAL"}
 
     @staticmethod
-    def get_connected_socket(reroute, in_out):
-        try:
-            if in_out == 'INPUT':
-                return reroute.inputs[0].links[0].from_socket
-            elif in_out == 'OUTPUT':
-                return reroute.outputs[0].links[0].to_socket
-        
-        except IndexError:
-            return None
+    def get_tree_state(context):
+        tree = context.space_data.edit_tree
+        return None if tree is None else (tree.as_pointer(), len(tree.nodes))
+
+    def is_own_timer(self):
+        # Timer events do not tell which timer fired, but only the timer that fired has its duration updated
+        duration, self._timer_duration = self._timer_duration, self._timer.time_duration
+        return duration != self._timer_duration
+
+    def finish(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        wm.progress_end()
+        utils.refresh_ui(context)
+
+    def create_job(self, table, reroutes, prefs):
+        passes = straighten.get_passes(self.target_reroutes, prefs.resolve_ambiguous_reroutes)
+
+        return straighten.StraightenJob(
+            table, reroutes, passes, padding=prefs.reroute_padding,
+            reposition_exceeding_reroutes=prefs.reposition_exceeding_reroutes,
+            socket_source=utils.get_socket_source(prefs.socket_location_source),
+            refresh=lambda: utils.redraw_node_editor(bpy.context))
+
+    def apply(self, context, job):
+        if job.has_changes():
+            # The previous locations are read from the reroutes, so they are recorded before being overwritten
+            if self.record_deltas:
+                straighten.last_deltas = straighten.StraightenDeltas(job, context.space_data.edit_tree)
+            else:
+                straighten.last_deltas = None
+
+        job.apply()
+
+    def report_result(self, context, job, prefs):
+        if job.stale:
+            self.report({'WARNING'}, f'{len(job.stale)} socket location(s) could not be refreshed and may be outdated.')
+
+        if not job.has_changes():
+            self.report({'WARNING'}, 'Reroute links are already straightened.')
+            return {"CANCELLED"}
+
+        self.report({'INFO'}, 'Successfully straightened reroute links.')
+        return {"FINISHED"}
+
+    def straighten(self, context, table, reroutes, prefs):
+        job = self.create_job(table, reroutes, prefs)
+        job.run()
+        self.apply(context, job)
+
+        return self.report_result(context, job, prefs)
+
+    def execute(self, context):
+        prefs = fetch_preferences_snapshot()
+        return self.straighten(context, *fetch_reroutes(context, prefs), prefs)
+
+
+class NODE_OT_straighten_reroutes(StraightenReroutesOperator, Operator):
+    bl_idname = "node.straighten_reroutes"
+    bl_label = "Straighten Reroutes"
+    bl_description = "Reposition reroutes such that the links they have to other nodes are straight"
+    bl_options = {"REGISTER", "UNDO"}
+
+
+class NODE_OT_straighten_reroutes_fast(StraightenReroutesOperator, Operator):
+    bl_idname = "node.straighten_reroutes_fast"
+    bl_label = "Straighten Reroutes (Fast)"
+    bl_description = "Reposition reroutes such that the links they have to other nodes are straight, recording only the moved reroutes instead of a global undo step"
+    bl_options = {"REGISTER"}
+
+    record_deltas = True
+
+
+class NODE_OT_reorder_reroute_trunks(Operator):
+    bl_idname = "node.reorder_reroute_trunks"
+    bl_label = "Reorder Reroute Trunks"
+    bl_description = "Swap the heights of overlapping reroute chains such that fewer links cross each other"
+    bl_options = {"REGISTER", "UNDO"}
+
+    @classmethod
+    def poll(cls, context):
+        return is_node_tree_editor(context)
 
     @staticmethod
-    def is_connected_to_non_reroute(reroute, in_out):
-        try:
-            if in_out == 'INPUT':
-                node = reroute.inputs[0].links[0].from_node
-            elif in_out == 'OUTPUT':
-                node = reroute.outputs[0].links[0].to_node
-
-            return node.bl_idname != 'NodeReroute'
-        
-        except IndexError:
-            return False
+    def measure_links(table, reroutes, socket_source):
+        lookup = {table_index: i for i, table_index in enumerate(reroutes)}
+        locator = utils.SocketLocator(socket_source, table)
+        positions = array('f')
+        links = crossings.RerouteLinks()
+
+        def get_endpoint(node, socket):
+            if (index := lookup.get(table.indices.get(node.as_pointer()))) is not None:
+                return index
+            if (location := locator.resolve(socket)) is not None:
+                return tuple(location)
+            return None
 
-    def straighten_reroutes(self, reroutes, *, in_out):
-        prefs = fetch_user_preferences()
-        padding = prefs.reroute_padding
-
-        if in_out == 'INPUT':
-            clamp_function = max
-            offset = padding
-        elif in_out == 'OUTPUT':
-            clamp_function = min
-            offset = -padding
-        else:
-            raise ValueError(f"'{in_out}' invalid value for parameter 'in_out'.")
-
-        #reroutes_to_straighten = tuple(r for r in reroutes if self.is_connected_to_non_reroute(r, in_out=in_out))
-        reroutes_to_straighten = tuple(r for r in reroutes)
-        for reroute in reroutes_to_straighten:
-            target_socket = self.get_connected_socket(reroute, in_out=in_out)
-            if target_socket is None:
-                continue
-            
-            target = utils.get_socket_location(target_socket)
-            
-            if prefs.reposition_exceeding_reroutes:
-                reroute.location.x = clamp_function(reroute.location.x , target.x + offset)
-            reroute.location.y = target.y
-
-        return
+        for index, reroute in enumerate(table.iter_nodes(reroutes)):
+            offset_x, offset_y = table.get_offset(reroute)
+            positions.extend((reroute.location.x + offset_x, reroute.location.y + offset_y))
+
+            for link in reroute.inputs[0].links:
+                if (start := get_endpoint(link.from_node, link.from_socket)) is not None:
+                    links.add(start, index)
+
+            # Links between two reroutes were already added from the input side
+            for link in reroute.outputs[0].links:
+                if lookup.get(table.indices.get(link.to_node.as_pointer())) is None:
+                    if (end := get_endpoint(link.to_node, link.to_socket)) is not None:
+                        links.add(index, end)
+
+        return positions, links
 
     def execute(self, context):
-        target_reroutes = self.target_reroutes
-        prefs = fetch_user_preferences()
+        prefs = fetch_preferences_snapshot()
+        table, reroutes = fetch_reroutes(context, prefs)
 
-        nodes = utils.fetch_nodes(context, target=prefs.apply_to)
-        reroutes = tuple(n for n in nodes if n.bl_idname == "NodeReroute")
+        positions, links = self.measure_links(table, reroutes, utils.get_socket_source(prefs.socket_location_source))
+        old_positions = array('f', positions)
 
-        old_positions = tuple(map(tuple, (r.location for r in reroutes)))
+        trunks = straighten.partition(len(reroutes), links.reroute_edges())
+        before, after = crossings.reorder_trunks(links, positions, trunks)
 
-        with utils.TemporaryUnframe(nodes=nodes):
-            if target_reroutes == 'INPUT':
-                self.straighten_reroutes(reroutes, in_out='INPUT')
+        if after >= before:
+            self.report({'WARNING'}, f'No reordering reduces the {before} link crossing(s).')
+            return {"CANCELLED"}
 
-            elif target_reroutes == 'OUTPUT':
-                self.straighten_reroutes(reroutes, in_out='OUTPUT')
+        offsets = table.get_offsets(reroutes)
+        for index, reroute in enumerate(table.iter_nodes(reroutes)):
+            # Reroutes of trunks that were not swapped are left as they are, rather than round-tripped through their offset
+            if positions[2 * index:2 * index + 2] != old_positions[2 * index:2 * index + 2]:
+                reroute.location = (
+                    positions[2 * index] - offsets[2 * index],
+                    positions[2 * index + 1] - offsets[2 * index + 1],
+                )
 
-            elif target_reroutes == 'BOTH':
-                if prefs.resolve_ambiguous_reroutes == 'INPUT':
-                    self.straighten_reroutes(reroutes, in_out='OUTPUT')
-                    self.straighten_reroutes(reroutes, in_out='INPUT')
-                elif prefs.resolve_ambiguous_reroutes == 'OUTPUT':
-                    self.straighten_reroutes(reroutes, in_out='INPUT')
-                    self.straighten_reroutes(reroutes, in_out='OUTPUT')
+        self.report({'INFO'}, f'Reduced link crossings from {before} to {after}.')
+        return {"FINISHED"}
 
-        new_positions = tuple(map(tuple, (r.location for r in reroutes)))
 
-        if old_positions == new_positions:
-            self.report({'WARNING'}, 'Reroute links are already straightened.')
+class NODE_OT_revert_straighten_reroutes(Operator):
+    bl_idname = "node.revert_straighten_reroutes"
+    bl_label = "Revert Last Straighten"
+    bl_description = "Move the reroutes of the last straightening done without a global undo step back to where they were"
+    bl_options = {"REGISTER"}
+
+    @classmethod
+    def poll(cls, context):
+        try:
+            return straighten.last_deltas is not None and context.space_data.edit_tree is not None
+
+        except AttributeError:
+            return False
+
+    def execute(self, context):
+        deltas = straighten.last_deltas
+        tree = context.space_data.edit_tree
+
+        if not deltas.matches(tree):
+            self.report({'WARNING'}, 'Nodes have changed since the last straightening, unable to revert it.')
             return {"CANCELLED"}
-        else:
-            self.report({'INFO'}, 'Successfully straightened reroute links.')
-            return {"FINISHED"}
+
+        deltas.revert(tree)
+        straighten.last_deltas = None
+        utils.refresh_ui(context)
+
+        self.report({'INFO'}, f'Reverted {len(deltas)} reroute(s).')
+        return {"FINISHED"}
 
 
 class NODE_OT_straighten_node_link(Operator):
@@ -156,6 +309,106 @@ class NODE_OT_straighten_node_link(Operator):
         return {"FINISHED"}
 
 
+class NODE_OT_check_socket_estimates(Operator):
+    bl_idname = "node.check_socket_estimates"
+    bl_label = "Check Socket Estimates"
+    bl_description = "Report how far the estimated socket locations deviate from the ones drawn by Blender"
+    bl_options = {"REGISTER"}
+
+    @classmethod
+    def poll(cls, context):
+        return is_node_tree_editor(context)
+
+    def execute(self, context):
+        prefs = fetch_preferences_snapshot()
+
+        table, indices = fetch_targets(context, prefs.apply_to)
+        count, max_deviation, mean_deviation = utils.compare_socket_estimates(table, indices)
+
+        if count == 0:
+            self.report({'WARNING'}, 'No drawn sockets to compare.')
+            return {"CANCELLED"}
+
+        self.report({'INFO'}, f"Compared {count} sockets : max deviation {max_deviation:.2f}, mean deviation {mean_deviation:.2f}")
+        return {"FINISHED"}
+
+
+class NodeArrangeOperator:
+    # Set by each operator : a function of the measured NodeEdges and of the value of the property named 'solver_option'
+    solver = None
+    solver_option = None
+    # Fewest nodes the solver can arrange, below which it leaves them as they are
+    min_nodes = 2
+
+    @classmethod
+    def poll(cls, context):
+        return is_node_tree_editor(context)
+
+    def execute(self, context):
+        table, selected = fetch_targets(context, 'SELECTED')
+        indices = array('i', (i for i, node in zip(selected, table.iter_nodes(selected)) if node.bl_idname != "NodeFrame"))
+
+        if len(indices) < self.min_nodes:
+            self.report({'WARNING'}, f'At least {self.min_nodes} nodes must be selected.')
+            return {"CANCELLED"}
+
+        offsets = table.get_offsets(indices)
+        edges = align.NodeEdges(table.iter_nodes(indices), offsets)
+        x, y = self.solver(edges, getattr(self, self.solver_option))
+
+        if (x, y) == (edges.x, edges.y):
+            self.report({'WARNING'}, 'Nodes are already arranged.')
+            return {"CANCELLED"}
+
+        align.write_locations(table.iter_nodes(indices), x, y, offsets)
+
+        return {"FINISHED"}
+
+
+class NODE_OT_align_nodes(NodeArrangeOperator, Operator):
+    bl_idname = "node.align_nodes"
+    bl_label = "Align Nodes"
+    bl_description = "Align the edges of the selected nodes"
+    bl_options = {"REGISTER", "UNDO"}
+
+    alignment: EnumProperty(
+        name="Alignment",
+        items=(
+            ("LEFT", "Left", "Align the left edges of the nodes"),
+            ("CENTER", "Center", "Align the horizontal centers of the nodes"),
+            ("RIGHT", "Right", "Align the right edges of the nodes"),
+            ("TOP", "Top", "Align the top edges of the nodes"),
+            ("MIDDLE", "Middle", "Align the vertical centers of the nodes"),
+            ("BOTTOM", "Bottom", "Align the bottom edges of the nodes"),
+        ),
+        default='LEFT',
+        description="Specifies which edge of the nodes is aligned")
+
+    solver = staticmethod(align.solve_align)
+    solver_option = "alignment"
+
+
+class NODE_OT_distribute_nodes(NodeArrangeOperator, Operator):
+    bl_idname = "node.distribute_nodes"
+    bl_label = "Distribute Nodes"
+    bl_description = "Space the selected nodes out evenly"
+    bl_options = {"REGISTER", "UNDO"}
+
+    axis: EnumProperty(
+        name="Axis",
+        items=(
+            ("HORIZONTAL", "Horizontal", "Distribute the nodes from left to right"),
+            ("VERTICAL", "Vertical", "Distribute the nodes from top to bottom"),
+        ),
+        default='HORIZONTAL',
+        description="Specifies along which axis the nodes are distributed")
+
+    solver = staticmethod(align.solve_distribute)
+    solver_option = "axis"
+    # Two nodes already span the whole distance, with a single gap between them
+    min_nodes = 3
+
+
 class NODE_OT_toggle_straighten_reroute_nodes(Operator):
     bl_idname = "node.toggle_straighten_reroute_nodes"
     bl_label = "Apply To"
@@ -164,22 +417,15 @@ class NODE_OT_toggle_straighten_reroute_nodes(Operator):
 
     @classmethod
     def poll(cls, context):
-        try:
-            space = context.space_data
-
-            is_existing = space.node_tree is not None
-            is_node_editor = space.type == "NODE_EDITOR"
-
-            return all((is_existing, is_node_editor))
-        
-        except AttributeError:
-            return False
+        return is_node_tree_editor(context)
 
     def execute(self, context):
         prefs = fetch_user_preferences()
         target = prefs.apply_to
 
         if target == 'SELECTED':
+            prefs.apply_to = "CHAINS"
+        elif target == 'CHAINS':
             prefs.apply_to = "ALL"
         elif target == 'ALL':
             prefs.apply_to = "SELECTED" 
@@ -192,16 +438,34 @@ class NODE_OT_toggle_straighten_reroute_nodes(Operator):
 
 classes = (
     NODE_OT_straighten_reroutes,
+    NODE_OT_straighten_reroutes_fast,
+    NODE_OT_revert_straighten_reroutes,
+    NODE_OT_reorder_reroute_trunks,
     NODE_OT_toggle_straighten_reroute_nodes,
     NODE_OT_straighten_node_link,
+    NODE_OT_check_socket_estimates,
+    NODE_OT_align_nodes,
+    NODE_OT_distribute_nodes,
 )
 
 
+@bpy.app.handlers.persistent
+def clear_last_deltas(*args):
+    # Pointers and default reroute names may repeat in the next file, which would make reverting move unrelated reroutes
+    straighten.last_deltas = None
+
+
 def register():
     for cls in classes:
         bpy.utils.register_class(cls)
 
+    if clear_last_deltas not in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.append(clear_last_deltas)
+
 
 def unregister():
+    if clear_last_deltas in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(clear_last_deltas)
+
     for cls in classes:
         bpy.utils.unregister_class(cls)
@@ -2,6 +2,7 @@ import bpy
 from bpy.props import BoolProperty, EnumProperty, IntProperty
 
 from .keymaps import keymap_layout, keymap_structure
+from .utils import invalidate_preferences
 
 
 class NodeLinkCleanupPreferences(bpy.types.AddonPreferences):
@@ -10,6 +11,7 @@ class NodeLinkCleanupPreferences(bpy.types.AddonPreferences):
     reposition_exceeding_reroutes: BoolProperty(
         name="Reposition Exceeding Reroutes",
         default=True,
+        update=invalidate_preferences,
         description="Specifies whether reroutes exceeding the horizontal position of their connected nodes are repositioned horizontally",
     )
 
@@ -19,6 +21,7 @@ class NodeLinkCleanupPreferences(bpy.types.AddonPreferences):
         min=0,
         soft_max=100,
         max=9999,
+        update=invalidate_preferences,
         description="Specifies how far the horizontal padding is when straightening reroutes"
     )
 
@@ -26,9 +29,11 @@ class NodeLinkCleanupPreferences(bpy.types.AddonPreferences):
         name="Apply To",
         items=(
             ("ALL", "All Nodes", "Target all nodes of current nodetree"),
-            ("SELECTED", "Selected Nodes", "Target only the selected nodes in current nodetree")
+            ("SELECTED", "Selected Nodes", "Target only the selected nodes in current nodetree"),
+            ("CHAINS", "Selected Chains", "Target the selected nodes, along with every reroute chained to the selected reroutes")
         ),
         default='SELECTED',
+        update=invalidate_preferences,
         description="Specifies which nodes the operators would target")
 
 
@@ -39,8 +44,35 @@ class NodeLinkCleanupPreferences(bpy.types.AddonPreferences):
             ("OUTPUT", "As Output", "Treat ambiguous reroutes as if connected to an output socket"),
         ),
         default='INPUT',
+        update=invalidate_preferences,
         description="Specifies how reroutes that are connected to both an input & output socket is treated")
 
+    socket_location_source: EnumProperty(
+        name="Socket Locations",
+        items=(
+            ("AUTO", "Auto", "Use drawn socket locations, or estimated ones when running in the background"),
+            ("DRAWN", "Drawn", "Use the socket locations cached by Blender when drawing the node editor"),
+            ("ESTIMATED", "Estimated", "Compute socket locations from the layout of their nodes, which also works for nodes that have not been drawn"),
+        ),
+        default='AUTO',
+        update=invalidate_preferences,
+        description="Specifies where the locations of sockets are taken from")
+
+    skip_global_undo: BoolProperty(
+        name="Skip Global Undo",
+        default=False,
+        update=invalidate_preferences,
+        description="Have the panel's buttons only record the moved reroutes instead of pushing a global undo step, which is much cheaper on large files. Use 'Revert Last Straighten' to undo the result",
+    )
+
+    background_threshold: IntProperty(
+        name="Background Threshold",
+        default=2000,
+        min=1,
+        update=invalidate_preferences,
+        description="Number of reroutes above which straightening runs in small steps in the background, showing its progress and allowing it to be cancelled with Esc"
+    )
+
 
     def draw(self, context):
         layout = self.layout
@@ -59,6 +91,12 @@ class NodeLinkCleanupPreferences(bpy.types.AddonPreferences):
 
         col2.label(text="Resolve Ambiguous Reroutes:")
         col2.prop(self, "resolve_ambiguous_reroutes", text="")
+        col2.separator(factor=0.5)
+        col2.label(text="Socket Locations:")
+        col2.prop(self, "socket_location_source", text="")
+        col2.separator(factor=0.5)
+        col2.prop(self, "background_threshold")
+        col2.prop(self, "skip_global_undo")
 
         keymap_layout.draw_keyboard_shorcuts(self, layout, context)
 
@@ -68,7 +106,9 @@ keymap_layout.register_properties(preferences=NodeLinkCleanupPreferences)
 
 def register():
     bpy.utils.register_class(NodeLinkCleanupPreferences)
+    invalidate_preferences()
 
 
 def unregister():
     bpy.utils.unregister_class(NodeLinkCleanupPreferences)
+    invalidate_preferences()
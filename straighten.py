@@ -0,0 +1,393 @@
+import math
+import time
+
+from array import array
+
+from . import utils
+
+# Deltas of the last straightening done without a global undo step
+last_deltas = None
+
+
+def get_connected_socket(reroute, in_out):
+    try:
+        if in_out == 'INPUT':
+            return reroute.inputs[0].links[0].from_socket
+        elif in_out == 'OUTPUT':
+            return reroute.outputs[0].links[0].to_socket
+
+    except IndexError:
+        return None
+
+
+def get_passes(target_reroutes, resolve_ambiguous_reroutes):
+    if target_reroutes == 'INPUT':
+        return ('INPUT',)
+    elif target_reroutes == 'OUTPUT':
+        return ('OUTPUT',)
+    elif target_reroutes == 'BOTH':
+        # The pass that runs last decides the final height of ambiguous reroutes
+        if resolve_ambiguous_reroutes == 'INPUT':
+            return ('OUTPUT', 'INPUT')
+        elif resolve_ambiguous_reroutes == 'OUTPUT':
+            return ('INPUT', 'OUTPUT')
+
+    raise ValueError(f"'{target_reroutes}' invalid value for parameter 'target_reroutes'.")
+
+
+def solve_position(location, target, *, in_out, padding, reposition_exceeding_reroutes):
+    x, y = location
+    target_x, target_y = target
+
+    if reposition_exceeding_reroutes:
+        if in_out == 'INPUT':
+            x = max(x, target_x + padding)
+        elif in_out == 'OUTPUT':
+            x = min(x, target_x - padding)
+        else:
+            raise ValueError(f"'{in_out}' invalid value for parameter 'in_out'.")
+
+    return x, target_y
+
+
+def partition(count, edges):
+    """
+    Splits the indices 0..count-1 into connected components, using the given index pairs as edges.
+    """
+
+    roots = list(range(count))
+
+    def find(index):
+        while roots[index] != index:
+            roots[index] = roots[roots[index]]
+            index = roots[index]
+        return index
+
+    for a, b in edges:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            roots[max(root_a, root_b)] = min(root_a, root_b)
+
+    components = {}
+    for index in range(count):
+        components.setdefault(find(index), []).append(index)
+
+    return tuple(tuple(c) for c in components.values())
+
+
+class StraightenJob:
+    def __init__(self, table, indices, passes, *, padding, reposition_exceeding_reroutes,
+                 socket_source='DRAWN', refresh=None):
+        """
+        Splits straightening into a measuring phase, which reads socket locations and links from Blender,
+        and a solving phase, which works only on the measured data. Both phases are generators
+        so that they can be advanced in small steps, see run_for().
+
+        Positions are kept in flat x/y float arrays, with NaN marking reroutes that have no target.
+        They are absolute, using the table's cached parent offsets, and are made relative again when written back,
+        so that reroutes never have to be taken out of their frames.
+
+        Args:
+            table : NodeTable of the node tree the reroutes belong to
+            indices : Indices of the reroutes to straighten in the table
+            passes : Sequence of 'INPUT'/'OUTPUT' passes, in the order they are applied
+            socket_source (optional): Either 'DRAWN', to read socket locations cached by Blender, or 'ESTIMATED'
+            refresh (optional): Called once if stale socket locations were measured, to have Blender redraw them
+        """
+
+        self.table = table
+        self.indices = array('i', indices)
+        self.offsets = table.get_offsets(self.indices)
+        self.passes = tuple(passes)
+        self.padding = padding
+        self.reposition_exceeding_reroutes = reposition_exceeding_reroutes
+
+        self.old_positions = self.read_positions()
+        self.new_positions = array('f', self.old_positions)
+        self.targets = {}
+        self.edges = array('i')
+        self.locator = utils.SocketLocator(socket_source, table)
+        self.refresh = refresh
+        self.stale = []
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def total_steps(self):
+        return len(self) * (len(self.passes) + 1)
+
+    def iter_reroutes(self):
+        return self.table.iter_nodes(self.indices)
+
+    def read_positions(self):
+        positions = array('f')
+        for reroute in self.iter_reroutes():
+            positions.extend(reroute.location)
+
+        return array('f', (p + o for p, o in zip(positions, self.offsets)))
+
+    def measure(self):
+        lookup = {table_index: i for i, table_index in enumerate(self.indices)}
+        table_indices = self.table.indices
+
+        for in_out in self.passes:
+            targets = self.targets[in_out] = array('f', (math.nan,)) * (2 * len(self))
+
+            for index, reroute in enumerate(self.iter_reroutes()):
+                socket = get_connected_socket(reroute, in_out)
+
+                if socket is not None:
+                    if (location := self.measure_socket(socket, in_out, index)) is not None:
+                        targets[2 * index:2 * index + 2] = array('f', location)
+
+                    if (other := lookup.get(table_indices.get(socket.node.as_pointer()))) is not None:
+                        self.edges.extend((index, other))
+                yield
+
+    def measure_socket(self, socket, in_out, index):
+        """
+        Returns the location of the socket, or None if it is not drawn. Sockets of collapsed nodes
+        resolve to the node's link anchor.
+        """
+
+        if utils.is_collapsed(socket.node):
+            return self.locator.get_anchors(socket.node)[socket.is_output]
+
+        if not utils.is_socket_drawn(socket):
+            return None
+
+        if self.locator.source == 'ESTIMATED':
+            return tuple(self.locator.estimate(socket))
+
+        location = self.read_socket_location(socket)
+
+        if utils.is_location_stale(socket, location, self.table):
+            self.stale.append((index, in_out))
+
+        return location
+
+    def read_socket_location(self, socket):
+        return tuple(utils.get_socket_location(socket))
+
+    def remeasure_stale(self):
+        if not self.stale or self.refresh is None:
+            return
+
+        self.refresh()
+        self.table.clear_rects()
+        stale, self.stale = sorted(self.stale), []
+        reroutes = self.table.iter_nodes(self.indices[index] for index, _ in stale)
+
+        for (index, in_out), reroute in zip(stale, reroutes):
+            socket = get_connected_socket(reroute, in_out)
+            if (location := self.measure_socket(socket, in_out, index)) is not None:
+                self.targets[in_out][2 * index:2 * index + 2] = array('f', location)
+            yield
+
+    def solve(self):
+        # Each reroute only depends on its own measured targets, so reroutes are solved one by one
+        old_positions, new_positions = self.old_positions, self.new_positions
+
+        for index in range(len(self)):
+            position = old_positions[2 * index], old_positions[2 * index + 1]
+
+            for in_out in self.passes:
+                targets = self.targets[in_out]
+                target = targets[2 * index], targets[2 * index + 1]
+
+                if not math.isnan(target[0]):
+                    position = solve_position(
+                        position, target, in_out=in_out, padding=self.padding,
+                        reposition_exceeding_reroutes=self.reposition_exceeding_reroutes)
+
+            new_positions[2 * index:2 * index + 2] = array('f', position)
+            yield
+
+    def steps(self):
+        yield from self.measure()
+        yield from self.remeasure_stale()
+        yield from self.solve()
+
+    def run(self):
+        for _ in self.steps():
+            pass
+
+    def get_chains(self):
+        """
+        Returns the indices of the reroutes linked to each other, grouped into chains.
+        """
+
+        return partition(len(self), zip(self.edges[::2], self.edges[1::2]))
+
+    def is_moved(self, index):
+        return self.old_positions[2 * index:2 * index + 2] != self.new_positions[2 * index:2 * index + 2]
+
+    def write_positions(self, positions):
+        positions = array('f', (p - o for p, o in zip(positions, self.offsets)))
+
+        # Unmoved reroutes are skipped, as making their position relative again may not round back to their location
+        for index, reroute in enumerate(self.iter_reroutes()):
+            if self.is_moved(index):
+                reroute.location = positions[2 * index:2 * index + 2]
+
+    def apply(self):
+        self.write_positions(self.new_positions)
+
+    def has_changes(self):
+        # Positions are stored with the same precision as node locations, so there is no need to read them back
+        return self.old_positions != self.new_positions
+
+
+class StraightenDeltas:
+    """
+    Records the reroutes moved by a StraightenJob along with their previous location,
+    so that the job can be reverted without relying on a global undo step.
+    Jobs never change the parents of reroutes, so only locations need restoring.
+
+    Locations are read from the reroutes themselves, so the deltas must be recorded before the job is applied.
+    """
+
+    __slots__ = ("tree_pointer", "names", "locations")
+
+    def __init__(self, job, tree):
+        self.tree_pointer = tree.as_pointer()
+        self.locations = array('f')
+        names = []
+
+        for index, reroute in enumerate(job.iter_reroutes()):
+            if job.is_moved(index):
+                names.append(reroute.name)
+                self.locations.extend(reroute.location)
+
+        self.names = tuple(names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def find_nodes(self, tree):
+        # Node names are unique within a tree, so the reroutes are found again with a single walk over it
+        lookup = {name: index for index, name in enumerate(self.names)}
+        nodes = [None] * len(self)
+
+        for node in tree.nodes:
+            if (index := lookup.get(node.name)) is not None:
+                nodes[index] = node
+
+        return nodes
+
+    def matches(self, tree):
+        if tree is None or tree.as_pointer() != self.tree_pointer:
+            return False
+
+        return None not in self.find_nodes(tree)
+
+    def revert(self, tree):
+        for index, node in enumerate(self.find_nodes(tree)):
+            node.location = self.locations[2 * index:2 * index + 2]
+
+
+class StraightenPlan:
+    """
+    Result of straightening a node tree without modifying it, see plan_straighten().
+    Positions are absolute, and reroutes linked to each other share the same chain id.
+    """
+
+    __slots__ = ("tree_name", "names", "old_positions", "new_positions", "chain_ids", "stale_count")
+
+    def __init__(self, tree_name, job):
+        self.tree_name = tree_name
+        self.names = tuple(node.name for node in job.iter_reroutes())
+        self.old_positions = array('f', job.old_positions)
+        self.new_positions = array('f', job.new_positions)
+        self.chain_ids = array('i', (0,)) * len(job)
+        self.stale_count = len(job.stale)
+
+        for chain_id, chain in enumerate(job.get_chains()):
+            for index in chain:
+                self.chain_ids[index] = chain_id
+
+    def __len__(self):
+        return len(self.names)
+
+    def get_displacements(self):
+        old, new = self.old_positions, self.new_positions
+        return [
+            math.hypot(new[2 * i] - old[2 * i], new[2 * i + 1] - old[2 * i + 1])
+            for i in range(len(self))
+        ]
+
+    def summary(self):
+        displacements = self.get_displacements()
+        moved = [d for d in displacements if d > 0]
+
+        return {
+            "tree": self.tree_name,
+            "reroutes": len(self),
+            "chains": len(set(self.chain_ids)),
+            "moved": len(moved),
+            "max_displacement": max(moved, default=0.0),
+            "mean_displacement": sum(moved) / len(moved) if moved else 0.0,
+            "stale_sockets": self.stale_count,
+        }
+
+    def to_dict(self, *, moved_only=True):
+        displacements = self.get_displacements()
+        old, new = self.old_positions, self.new_positions
+
+        return {
+            "summary": self.summary(),
+            "reroutes": [
+                {
+                    "name": name,
+                    "chain": self.chain_ids[i],
+                    "old": (old[2 * i], old[2 * i + 1]),
+                    "new": (new[2 * i], new[2 * i + 1]),
+                }
+                for i, name in enumerate(self.names)
+                if displacements[i] > 0 or not moved_only
+            ],
+        }
+
+
+def plan_straighten(node_tree, prefs, *, target_reroutes='BOTH', apply_to='ALL', job_type=StraightenJob):
+    """
+    Straightens the reroutes of a node tree without writing anything back to it, and returns the StraightenPlan.
+    Meant to be used to check whether node trees need cleaning up, including from background mode.
+
+    Args:
+        node_tree : Node tree to analyze
+        prefs : PreferencesSnapshot, or the add-on's preferences
+        target_reroutes (optional): Same as the 'target_reroutes' property of NODE_OT_straighten_reroutes
+        apply_to (optional): Same as the 'apply_to' preference, ignoring the preference's own value
+        job_type (optional): StraightenJob subclass to use, such as one reading recorded socket locations
+    """
+
+    table, indices = utils.fetch_node_table(node_tree, target=apply_to)
+    reroutes = array('i', (i for i in indices if table.is_reroute[i]))
+
+    job = job_type(
+        table, reroutes, get_passes(target_reroutes, prefs.resolve_ambiguous_reroutes),
+        padding=prefs.reroute_padding,
+        reposition_exceeding_reroutes=prefs.reposition_exceeding_reroutes,
+        socket_source=utils.get_socket_source(prefs.socket_location_source))
+    job.run()
+
+    return StraightenPlan(node_tree.name, job)
+
+
+def run_for(steps, budget):
+    """
+    Advances the steps iterator until it is exhausted or until the time budget (in seconds) runs out.
+    Returns the number of steps taken and whether the iterator was exhausted.
+    """
+
+    deadline = time.perf_counter() + budget
+    count = 0
+
+    for _ in steps:
+        count += 1
+        if time.perf_counter() >= deadline:
+            return count, False
+
+    return count, True
@@ -0,0 +1,19 @@
+"""
+Loads the add-on's modules as a package without running its __init__.py, which registers it with Blender.
+Outside of Blender, the stand-ins for Blender's modules in tests/stubs are used.
+"""
+
+import importlib.util
+import os
+import sys
+import types
+
+tests_dir = os.path.dirname(os.path.abspath(__file__))
+addon_dir = os.path.dirname(tests_dir)
+
+if importlib.util.find_spec("bpy") is None:
+    sys.path.insert(0, os.path.join(tests_dir, "stubs"))
+
+package = types.ModuleType("link_cleanup")
+package.__path__ = [addon_dir]
+sys.modules.setdefault("link_cleanup", package)
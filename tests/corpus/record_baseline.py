@@ -0,0 +1,113 @@
+"""
+Records golden files from the straightening code the add-on started from, to check that later changes kept its layouts.
+Only trees without collapsed nodes or hidden linked sockets are recorded, as the original code did not handle these.
+
+The original add-on is checked out next to this one, and its operator is run on stand-ins for the corpus nodes
+that behave like Blender's: locations are float32 and changed in place, and changing a node's parent keeps it in place.
+    git worktree add /tmp/baseline <baseline commit>
+    python tests/corpus/record_baseline.py /tmp/baseline tests/corpus/trees/frames_and_chains.json tests/corpus/baseline
+"""
+
+import argparse
+import importlib
+import json
+import os
+import sys
+import types
+
+from array import array
+
+tests_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, tests_dir)
+
+import conftest  # noqa: E402, sets up the link_cleanup package and Blender's stand-ins
+
+from link_cleanup import corpus  # noqa: E402
+
+
+class Location:
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = array('f', values)
+
+    x = property(lambda self: self.values[0], lambda self, value: self.values.__setitem__(0, value))
+    y = property(lambda self: self.values[1], lambda self, value: self.values.__setitem__(1, value))
+
+    def __iter__(self):
+        return iter(self.values)
+
+
+def get_absolute_location(node):
+    x, y = node.location
+    while (node := node.parent) is not None:
+        x, y = x + node.location.x, y + node.location.y
+    return x, y
+
+
+class BaselineNode(corpus.CorpusNode):
+    __slots__ = ()
+
+    @property
+    def parent(self):
+        return corpus.CorpusNode.parent.__get__(self)
+
+    @parent.setter
+    def parent(self, frame):
+        x, y = get_absolute_location(self)
+        corpus.CorpusNode.parent.__set__(self, frame)
+
+        frame_x, frame_y = (0.0, 0.0) if frame is None else get_absolute_location(frame)
+        self.location.x, self.location.y = x - frame_x, y - frame_y
+
+
+def load_baseline(addon_dir):
+    package = types.ModuleType("baseline_addon")
+    package.__path__ = [addon_dir]
+    sys.modules["baseline_addon"] = package
+
+    operators = importlib.import_module("baseline_addon.operators")
+    prefs = lambda attr_id=None: corpus.replay_preferences if attr_id is None else getattr(corpus.replay_preferences, attr_id)
+
+    operators.fetch_user_preferences = operators.utils.fetch_user_preferences = prefs
+    operators.utils.get_socket_location = lambda sk: sk.location
+    return operators
+
+
+def record_tree(operators, filepath):
+    tree = corpus.CorpusTree.load(filepath)
+    for node in tree.nodes:
+        node.__class__ = BaselineNode
+        node.location = Location(node.location)
+
+    reroutes = [node for node in tree.nodes if node.bl_idname == "NodeReroute"]
+    old_positions = [get_absolute_location(r) for r in reroutes]
+
+    operator = operators.NODE_OT_straighten_reroutes()
+    operator.target_reroutes = 'BOTH'
+    operator.report = lambda level, message: None
+    operator.execute(types.SimpleNamespace(space_data=types.SimpleNamespace(edit_tree=tree), selected_nodes=[]))
+
+    return {
+        "reroutes": [
+            {"name": r.name, "old": old, "new": get_absolute_location(r)}
+            for r, old in zip(reroutes, old_positions)
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record golden files from the original straightening code")
+    parser.add_argument("baseline_dir")
+    parser.add_argument("trees", nargs="+")
+    parser.add_argument("golden_dir")
+    args = parser.parse_args()
+
+    operators = load_baseline(os.path.abspath(args.baseline_dir))
+    for filepath in args.trees:
+        with open(os.path.join(args.golden_dir, os.path.basename(filepath)), "w") as file:
+            json.dump(record_tree(operators, filepath), file, indent=1)
+
+
+if __name__ == "__main__":
+    main()
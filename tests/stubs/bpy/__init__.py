@@ -0,0 +1,18 @@
+"""
+Minimal stand-in for Blender's bpy module, used when running the tests outside of Blender.
+It only provides what the add-on touches when being imported, and what its context-free logic reads,
+such as the corpus replay. Nothing can be registered or drawn with it.
+"""
+
+from types import SimpleNamespace
+
+from . import props, types
+
+app = SimpleNamespace(
+    version=(4, 2, 0), version_string="4.2.0", background=True,
+    handlers=SimpleNamespace(persistent=lambda function: function, load_pre=[]),
+)
+
+context = SimpleNamespace(
+    preferences=SimpleNamespace(view=SimpleNamespace(ui_scale=1.0), addons={}),
+)
@@ -0,0 +1,13 @@
+def deferred_property(name):
+    # Properties are only declared, as they are in Blender until the class holding them is registered
+    def declare(**keywords):
+        return name, keywords
+
+    return declare
+
+
+BoolProperty = deferred_property("BoolProperty")
+EnumProperty = deferred_property("EnumProperty")
+FloatProperty = deferred_property("FloatProperty")
+IntProperty = deferred_property("IntProperty")
+StringProperty = deferred_property("StringProperty")
@@ -0,0 +1,18 @@
+class bpy_struct:
+    pass
+
+
+class Operator(bpy_struct):
+    pass
+
+
+class Panel(bpy_struct):
+    pass
+
+
+class Menu(bpy_struct):
+    pass
+
+
+class AddonPreferences(bpy_struct):
+    pass
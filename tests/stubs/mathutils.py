@@ -0,0 +1,29 @@
+import math
+
+
+class Vector(tuple):
+    """
+    Immutable stand-in for mathutils.Vector, with only the operations the add-on uses.
+    """
+
+    def __new__(cls, values):
+        return super().__new__(cls, values)
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+
+    @property
+    def length(self):
+        return math.hypot(*self)
+
+    def __add__(self, other):
+        return Vector(a + b for a, b in zip(self, other))
+
+    def __sub__(self, other):
+        return Vector(a - b for a, b in zip(self, other))
+
+    def __mul__(self, factor):
+        return Vector(a * factor for a in self)
+
+    def __truediv__(self, divisor):
+        return Vector(a / divisor for a in self)
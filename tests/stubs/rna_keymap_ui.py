@@ -0,0 +1,7 @@
+def _indented_layout(layout, level):
+    # Nothing is drawn outside of Blender, so the layout is handed back as it is
+    return layout
+
+
+def draw_km(display_keymaps, kc, km, children, layout, level):
+    pass
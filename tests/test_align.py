@@ -0,0 +1,55 @@
+from array import array
+
+from link_cleanup import align, corpus
+
+
+def create_node(x, y, width, height, *, hide=False):
+    return corpus.CorpusNode({
+        "name": "Node", "bl_idname": "ShaderNodeMath", "location": (x, y), "width": width,
+        "dimensions": (width, height), "hide": hide, "inputs": [], "outputs": [],
+    })
+
+
+def measure(nodes):
+    return align.NodeEdges(nodes, array('f', (0.0,)) * (2 * len(nodes)))
+
+
+def test_align_left():
+    edges = measure([create_node(0, 0, 100, 50), create_node(40, 200, 150, 80), create_node(-20, -100, 80, 40)])
+    x, y = align.solve_align(edges, 'LEFT')
+
+    assert list(x) == [-20, -20, -20]
+    assert y == edges.y
+
+
+def test_align_center():
+    edges = measure([create_node(0, 0, 100, 50), create_node(100, 200, 200, 80)])
+    x, y = align.solve_align(edges, 'CENTER')
+
+    # The nodes span from 0 to 300, so their centers end up at 150
+    assert list(x) == [100, 50]
+    assert y == edges.y
+
+
+def test_align_middle():
+    # Collapsed nodes are drawn centered a little below their location
+    edges = measure([create_node(0, 0, 100, 60), create_node(300, -100, 100, 20, hide=True)])
+    x, y = align.solve_align(edges, 'MIDDLE')
+
+    # The nodes span from -120 to 0, so their middles end up at -60
+    assert x == edges.x
+    assert list(y) == [-30, -50]
+
+
+def test_distribute_vertical():
+    edges = measure([create_node(0, 0, 100, 50), create_node(0, -60, 100, 30), create_node(0, -200, 100, 100)])
+    x, y = align.solve_distribute(edges, 'VERTICAL')
+
+    # The outermost nodes stay in place, and the 120 units they leave free are split into two equal gaps
+    assert x == edges.x
+    assert list(y) == [0, -110, -200]
+
+
+def test_distribute_leaves_two_nodes_in_place():
+    edges = measure([create_node(0, 0, 100, 50), create_node(500, 0, 100, 50)])
+    assert align.solve_distribute(edges, 'HORIZONTAL') == (edges.x, edges.y)
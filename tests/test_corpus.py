@@ -0,0 +1,44 @@
+import json
+import os
+
+from link_cleanup import corpus
+
+corpus_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def test_corpus_matches_golden_files():
+    # Throughput baselines only hold on the machine they were recorded on, see corpus.main() for comparing them
+    failures = corpus.run_corpus(
+        os.path.join(corpus_dir, "trees"), os.path.join(corpus_dir, "golden"), max_slowdown=None, repeats=1)
+
+    assert not failures, "\n".join(failures)
+
+
+def test_corpus_matches_baseline_algorithm():
+    # Recorded from the original straightening code with tests/corpus/record_baseline.py, unlike the golden files,
+    # which are recorded with --update. Covers the trees without collapsed nodes or hidden linked sockets
+    baseline_dir = os.path.join(corpus_dir, "baseline")
+    filenames = sorted(f for f in os.listdir(baseline_dir) if f.endswith(".json"))
+    assert filenames
+
+    for filename in filenames:
+        plan, _ = corpus.replay_tree(corpus.CorpusTree.load(os.path.join(corpus_dir, "trees", filename)))
+        with open(os.path.join(baseline_dir, filename)) as file:
+            max_error, mismatched_names = corpus.compare_positions(plan, json.load(file), 1e-3)
+
+        assert not mismatched_names, filename
+        assert max_error <= 1e-3, filename
+
+
+def test_small_trees_are_not_timed():
+    assert corpus.get_size_bucket(corpus.size_buckets[0] - 1) is None
+    assert corpus.get_size_bucket(corpus.size_buckets[0]) is not None
+
+
+def test_compare_throughput():
+    baseline = {"500-5000": 1000.0}
+
+    assert corpus.compare_throughput({"500-5000": 900.0}, baseline, 1.25) == []
+    assert len(corpus.compare_throughput({"500-5000": 700.0}, baseline, 1.25)) == 1
+    # Buckets without a baseline have nothing to regress from
+    assert corpus.compare_throughput({">=50000": 1.0}, baseline, 1.25) == []
@@ -0,0 +1,78 @@
+import itertools
+import random
+
+from array import array
+
+from link_cleanup import crossings
+
+
+def count_crossings_brute_force(segments):
+    segments = crossings.to_integer_segments(segments)
+    return sum(crossings.get_crossing_point(a, b) is not None for a, b in itertools.combinations(segments, 2))
+
+
+def test_links_crossing_at_one_point():
+    segments = [(0, -10, 100, 10), (0, 10, 100, -10), (0, 0, 100, 0), (50, -20, 50, 20)]
+    assert crossings.count_crossings(segments) == 6
+
+
+def test_touching_and_overlapping_links_do_not_cross():
+    segments = [(0, 0, 10, 0), (5, 0, 20, 0), (10, 0, 20, 10), (10, -5, 10, 5)]
+    # Only the vertical link properly crosses the second horizontal one
+    assert crossings.count_crossings(segments) == 1
+
+
+def test_matches_brute_force_on_grid_coordinates():
+    # Small grids make links share endpoints, overlap and cross at the same points
+    rng = random.Random(0)
+
+    for _ in range(3000):
+        size = rng.choice((3, 5, 10))
+        segments = [tuple(rng.randint(0, size) for _ in range(4)) for _ in range(rng.randint(1, 12))]
+        assert crossings.count_crossings(segments) == count_crossings_brute_force(segments), segments
+
+
+def test_matches_brute_force_on_float_coordinates():
+    rng = random.Random(1)
+
+    for _ in range(100):
+        segments = [tuple(rng.uniform(-100, 100) for _ in range(4)) for _ in range(20)]
+        assert crossings.count_crossings(segments) == count_crossings_brute_force(segments), segments
+
+
+def test_reorder_trunks_uncrosses_swapped_trunks():
+    # Trunk 0 runs along y=0 between sockets at y=100, trunk 1 along y=100 between sockets at y=0
+    positions = array('f', (100, 0, 200, 0, 100, 100, 200, 100))
+    links = crossings.RerouteLinks()
+    links.add((0, 100), 0)
+    links.add(0, 1)
+    links.add(1, (300, 100))
+    links.add((0, 0), 2)
+    links.add(2, 3)
+    links.add(3, (300, 0))
+
+    assert crossings.reorder_trunks(links, positions, ((0, 1), (2, 3))) == (2, 0)
+    assert positions == array('f', (100, 100, 200, 100, 100, 0, 200, 0))
+
+
+def test_reorder_trunks_keeps_positions_of_rejected_swaps():
+    # Each trunk runs straight between its own sockets, so swapping them only ever adds crossings.
+    # Reroutes within a trunk sit at different heights, which moving them there and back would not restore exactly
+    rng = random.Random(2)
+
+    for _ in range(200):
+        ys = [rng.uniform(-50, 50), rng.uniform(-50, 50), rng.uniform(100, 200), rng.uniform(100, 200)]
+        positions = array('f', (100, ys[0], 200, ys[1], 120, ys[2], 220, ys[3]))
+        links = crossings.RerouteLinks()
+        links.add((0, ys[0]), 0)
+        links.add(0, 1)
+        links.add(1, (300, ys[1]))
+        links.add((0, ys[2]), 2)
+        links.add(2, 3)
+        links.add(3, (300, ys[3]))
+
+        old_positions = array('f', positions)
+        before, after = crossings.reorder_trunks(links, positions, ((0, 1), (2, 3)))
+
+        assert after == before
+        assert positions == old_positions
@@ -0,0 +1,59 @@
+import os
+
+from array import array
+
+from mathutils import Vector
+
+from link_cleanup import corpus, straighten, utils
+
+trees_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "trees")
+
+
+def load_tree(name):
+    tree = corpus.CorpusTree.load(os.path.join(trees_dir, f"{name}.json"))
+
+    # Frames are moved off whole units, where converting between relative and absolute locations rounds.
+    # Locations are then stored with the same float32 precision as Blender's
+    for node in tree.nodes:
+        if node.bl_idname == "NodeFrame":
+            node.location = node.location + Vector((0.1, 0.3))
+        node.location = Vector(array('f', node.location))
+
+    return tree
+
+
+def create_job(tree):
+    table, indices = utils.fetch_node_table(tree, target='ALL')
+    reroutes = array('i', (i for i in indices if table.is_reroute[i]))
+
+    return corpus.RecordedStraightenJob(
+        table, reroutes, straighten.get_passes('BOTH', 'INPUT'), padding=30, reposition_exceeding_reroutes=True)
+
+
+def test_revert_restores_locations_exactly():
+    tree = load_tree("frames_and_chains")
+    locations = {node.name: tuple(node.location) for node in tree.nodes}
+
+    job = create_job(tree)
+    job.run()
+    deltas = straighten.StraightenDeltas(job, tree)
+    job.apply()
+
+    assert len(deltas) > 0
+    assert deltas.matches(tree)
+
+    deltas.revert(tree)
+    assert {node.name: tuple(node.location) for node in tree.nodes} == locations
+
+
+def test_apply_leaves_unmoved_reroutes_untouched():
+    tree = load_tree("frames_and_chains")
+    job = create_job(tree)
+    job.run()
+
+    reroutes = list(job.iter_reroutes())
+    unmoved = [(reroute, reroute.location) for index, reroute in enumerate(reroutes) if not job.is_moved(index)]
+    job.apply()
+
+    assert unmoved
+    assert all(reroute.location is location for reroute, location in unmoved)
@@ -0,0 +1,44 @@
+import os
+
+from link_cleanup import corpus, straighten, utils
+
+trees_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus", "trees")
+
+
+def get_reroute_chains(tree):
+    reroutes = [node for node in tree.nodes if node.bl_idname == "NodeReroute"]
+    lookup = {node.as_pointer(): index for index, node in enumerate(reroutes)}
+    edges = [
+        (lookup[link.from_node.as_pointer()], lookup[link.to_node.as_pointer()])
+        for link in tree.links
+        if link.from_node.as_pointer() in lookup and link.to_node.as_pointer() in lookup
+    ]
+
+    return [{reroutes[index].name for index in chain} for chain in straighten.partition(len(reroutes), edges)]
+
+
+def test_chains_target_expands_selection_to_whole_chains():
+    tree = corpus.CorpusTree.load(os.path.join(trees_dir, "frames_and_chains.json"))
+    chain = max(get_reroute_chains(tree), key=len)
+    selected = next(node for node in tree.nodes if node.name in chain)
+
+    # Chains are followed through the tree's links alone, never through the links of each socket
+    for node in tree.nodes:
+        for sk in (*node.inputs, *node.outputs):
+            sk.links = []
+
+    table, indices = utils.fetch_node_table(tree, target='CHAINS', selected_nodes=[selected])
+    assert len(chain) > 2
+    assert {node.name for node in table.iter_nodes(indices)} == chain
+
+
+def test_chain_expansion_stops_at_max_depth():
+    tree = corpus.CorpusTree.load(os.path.join(trees_dir, "frames_and_chains.json"))
+    chain = max(get_reroute_chains(tree), key=len)
+    selected = next(node for node in tree.nodes if node.name in chain)
+
+    table = utils.NodeTable([selected])
+    utils.expand_reroute_chains(table, tree.links, max_depth=1)
+    neighbours = utils.get_reroute_neighbours(tree.links)[selected.as_pointer()]
+
+    assert {node.name for node in table.nodes} == {selected.name, *(node.name for node in neighbours)}
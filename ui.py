@@ -2,7 +2,7 @@ import bpy
 from bpy.types import Menu, Panel
 
 from .import utils
-from .utils import fetch_user_preferences
+from .utils import fetch_preferences_snapshot, fetch_user_preferences
 
 import itertools
 from rna_keymap_ui import _indented_layout
@@ -21,13 +21,41 @@ class NODE_PT_straighten_reroute_links(Panel):
         layout.label(text="Apply To:")
         layout.prop(prefs, "apply_to", text="")
 
+        skip_global_undo = fetch_preferences_snapshot().skip_global_undo
+        operator = "node.straighten_reroutes_fast" if skip_global_undo else "node.straighten_reroutes"
+
         row = layout.row(align=True)
-        row.operator("node.straighten_reroutes", text="Inputs").target_reroutes = 'INPUT'
-        row.operator("node.straighten_reroutes", text="Outputs").target_reroutes = 'OUTPUT'
-        layout.operator("node.straighten_reroutes", text="All Reroutes").target_reroutes = 'BOTH'
+        row.operator(operator, text="Inputs").target_reroutes = 'INPUT'
+        row.operator(operator, text="Outputs").target_reroutes = 'OUTPUT'
+        layout.operator(operator, text="All Reroutes").target_reroutes = 'BOTH'
+        layout.operator("node.reorder_reroute_trunks", text="Reorder Trunks")
+
+        if skip_global_undo:
+            layout.operator("node.revert_straighten_reroutes", icon="LOOP_BACK")
         layout.menu("NODE_MT_straighten_node_link")
 
 
+class NODE_PT_align_nodes(Panel):
+    bl_label = "Align Nodes"
+    bl_category = "Cleanup"
+    bl_region_type = "UI"
+    bl_space_type = 'NODE_EDITOR'
+
+    def draw(self, context):
+        layout = self.layout
+
+        col = layout.column(align=True)
+        for alignments in (("LEFT", "CENTER", "RIGHT"), ("TOP", "MIDDLE", "BOTTOM")):
+            row = col.row(align=True)
+            for alignment in alignments:
+                row.operator("node.align_nodes", text=alignment.title()).alignment = alignment
+
+        layout.label(text="Distribute:")
+        row = layout.row(align=True)
+        row.operator("node.distribute_nodes", text="Horizontal").axis = 'HORIZONTAL'
+        row.operator("node.distribute_nodes", text="Vertical").axis = 'VERTICAL'
+
+
 class NODE_MT_straighten_node_link(Menu):
     bl_label = "Straighten Node Link"
     bl_space_type = 'NODE_EDITOR'
@@ -62,6 +90,7 @@ class NODE_MT_straighten_node_link(Menu):
 
 classes = (
     NODE_PT_straighten_reroute_links,
+    NODE_PT_align_nodes,
     NODE_MT_straighten_node_link
 )
 
@@ -1,12 +1,17 @@
 import bpy
 import ctypes
+import math
 import platform
 
-from functools import wraps
+from array import array
+from dataclasses import dataclass, fields
+from functools import lru_cache, wraps
 from mathutils import Vector
 
 weird_offset = 10
 reroute_width = 10
+# How far outside of its node's bounds a socket location may lie before being considered stale
+stale_margin = 2 * weird_offset
 
 
 def refresh_ui(context):
@@ -15,20 +20,103 @@ def refresh_ui(context):
     return None
 
 
-class TemporaryUnframe:
-    def __init__(self, nodes):
-        self.parent_dict = {}
+def redraw_node_editor(context):
+    # Drawing the node editor is what updates the socket locations cached by Blender
+    area = context.area
+    if area is None or area.type != 'NODE_EDITOR':
+        return
+
+    region = next((r for r in area.regions if r.type == 'WINDOW'), None)
+    if region is None:
+        return
+
+    with context.temp_override(area=area, region=region):
+        bpy.ops.wm.redraw_timer(type='DRAW', iterations=1)
+
+
+class NodeTable:
+    """
+    Compact, index based record of nodes. Nodes are referred to by their index in the table, and their data
+    is kept in parallel columns rather than in per-node objects.
+
+    The table starts out with the nodes it is built from, such as only the selected ones, so that large trees
+    are not walked when only part of them is targeted. Any other node, such as one linked to a targeted node,
+    is added the first time it is looked up. The node wrappers are kept so that looking a node up by index
+    is constant time, which it is not for Blender's node collections.
+
+    Node locations are relative to their parent frame. The absolute location of every frame is computed once,
+    and used as the offset of each of its children.
+    """
+
+    __slots__ = ("nodes", "indices", "offsets", "is_reroute", "rects", "frame_offsets")
+
+    def __init__(self, nodes=()):
+        self.nodes = []
+        self.indices = {}
+        self.offsets = array('f')
+        self.is_reroute = array('b')
+        self.rects = array('f')
+        self.frame_offsets = {}
+
         for node in nodes:
-            if node.parent is not None:
-                self.parent_dict[node] = node.parent
-            node.parent = None
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        """
+        Returns the index of the node, adding it to the table if it is not in it yet.
+        """
+
+        pointer = node.as_pointer()
+        if (index := self.indices.get(pointer)) is not None:
+            return index
+
+        index = self.indices[pointer] = len(self.nodes)
+        self.nodes.append(node)
+        self.offsets.extend(self.get_frame_offset(node.parent))
+        self.is_reroute.append(node.bl_idname == "NodeReroute")
+        self.rects.extend((math.nan,) * 4)
+
+        return index
 
-    def __enter__(self):
-        return self
+    def get_frame_offset(self, frame):
+        if frame is None:
+            return 0.0, 0.0
 
-    def __exit__(self, type, value, traceback):
-        for node, parent in self.parent_dict.items():
-            node.parent = parent
+        pointer = frame.as_pointer()
+        if (offset := self.frame_offsets.get(pointer)) is None:
+            parent_x, parent_y = self.get_frame_offset(frame.parent)
+            offset = self.frame_offsets[pointer] = (parent_x + frame.location.x, parent_y + frame.location.y)
+
+        return offset
+
+    def get_offsets(self, indices):
+        offsets = array('f')
+        for index in indices:
+            offsets.extend(self.offsets[2 * index:2 * index + 2])
+        return offsets
+
+    def get_offset(self, node):
+        index = self.add(node)
+        return self.offsets[2 * index], self.offsets[2 * index + 1]
+
+    def clear_rects(self):
+        self.rects = array('f', (math.nan,)) * (4 * len(self))
+
+    def iter_nodes(self, indices):
+        nodes = self.nodes
+        return (nodes[index] for index in indices)
+
+    def get_rect(self, node):
+        offset = 4 * self.add(node)
+        rects = self.rects
+
+        if math.isnan(rects[offset]):
+            rects[offset:offset + 4] = array('f', get_node_rect(node, self.get_offset(node)))
+
+        return rects[offset:offset + 4]
 
 
 def fetch_user_preferences(attr_id=None):
@@ -40,6 +128,117 @@ def fetch_user_preferences(attr_id=None):
         return getattr(prefs, attr_id)
 
 
+@dataclass(frozen=True, slots=True)
+class PreferencesSnapshot:
+    # Fields have no defaults, so that the properties of the add-on's preferences stay the only place they are defined
+    reposition_exceeding_reroutes: bool
+    reroute_padding: int
+    apply_to: str
+    resolve_ambiguous_reroutes: str
+    socket_location_source: str
+    background_threshold: int
+    skip_global_undo: bool
+
+    @classmethod
+    def from_preferences(cls, prefs):
+        return cls(**{field.name: getattr(prefs, field.name) for field in fields(cls)})
+
+
+# Bumped by the update callbacks of the add-on's preferences, see fetch_preferences_snapshot()
+preferences_version = 0
+cached_snapshot = (-1, None)
+
+
+def invalidate_preferences(self=None, context=None):
+    global preferences_version
+    preferences_version += 1
+
+
+def fetch_preferences_snapshot():
+    global cached_snapshot
+    version, snapshot = cached_snapshot
+
+    if version != preferences_version:
+        snapshot = PreferencesSnapshot.from_preferences(fetch_user_preferences())
+        cached_snapshot = (preferences_version, snapshot)
+
+    return snapshot
+
+
+def get_socket_source(source):
+    if source == 'AUTO':
+        # Socket locations are only cached by Blender while drawing, which never happens in background mode
+        return 'ESTIMATED' if bpy.app.background else 'DRAWN'
+    elif source in {'DRAWN', 'ESTIMATED'}:
+        return source
+    else:
+        raise ValueError(f"'{source}' is not a valid socket location source.")
+
+
+def get_reroute_neighbours(links):
+    """
+    Maps the pointer of every reroute linked to other reroutes to these reroutes, in a single pass over the links.
+    Sockets are not asked for their links, as that walks all the links of the tree for each of them.
+    """
+
+    neighbours = {}
+    for link in links:
+        from_node, to_node = link.from_node, link.to_node
+
+        if from_node.bl_idname == "NodeReroute" and to_node.bl_idname == "NodeReroute":
+            neighbours.setdefault(from_node.as_pointer(), []).append(to_node)
+            neighbours.setdefault(to_node.as_pointer(), []).append(from_node)
+
+    return neighbours
+
+
+def expand_reroute_chains(table, links, *, max_depth=1024):
+    """
+    Adds every reroute reachable from the reroutes of the table to it, following the given links breadth first
+    up to max_depth links away and stopping at non-reroute nodes.
+    """
+
+    neighbours = get_reroute_neighbours(links)
+    frontier = [node for node, is_reroute in zip(table.nodes, table.is_reroute) if is_reroute]
+
+    for _ in range(max_depth):
+        if not frontier:
+            break
+
+        next_frontier = []
+        for node in frontier:
+            for neighbour in neighbours.get(node.as_pointer(), ()):
+                if neighbour.as_pointer() not in table.indices:
+                    table.add(neighbour)
+                    next_frontier.append(neighbour)
+
+        frontier = next_frontier
+
+
+def fetch_node_table(node_tree, *, target="ALL", selected_nodes=None):
+    """
+    Returns a NodeTable starting with the targeted nodes, along with their indices in it.
+
+    Args:
+        selected_nodes (optional): The selected nodes of the tree, such as the context's, which spares walking the whole tree for them
+    """
+
+    if target == 'ALL':
+        table = NodeTable(node_tree.nodes)
+    elif target in {'SELECTED', 'CHAINS'}:
+        if selected_nodes is None:
+            selected_nodes = (node for node in node_tree.nodes if node.select)
+
+        table = NodeTable(selected_nodes)
+        if target == 'CHAINS':
+            expand_reroute_chains(table, node_tree.links)
+    else:
+        raise ValueError(f"'{target}' is not a valid target value.")
+
+    # Nodes added to the table later on, when looking up linked nodes, are not targeted
+    return table, array('i', range(len(table)))
+
+
 def fetch_nodes(context, *, target="ALL"):
     if target == 'ALL':
         return context.space_data.edit_tree.nodes
@@ -108,26 +307,40 @@ def get_bottom(node):
         return node.location.y - get_height(node)
 
 
-def get_bounds(nodes):
-    if len(nodes) <= 0:
-        return 0, 0, 0, 0
+def get_parent_offset(node):
+    offset_x = offset_y = 0
+    parent = node.parent
+
+    while parent is not None:
+        offset_x += parent.location.x
+        offset_y += parent.location.y
+        parent = parent.parent
+
+    return offset_x, offset_y
+
 
-    min_x = min(get_left(node) for node in nodes)
-    max_x = max(get_right(node) for node in nodes)
-    min_y = min(get_bottom(node) for node in nodes)
-    max_y = max(get_top(node) for node in nodes)
+def get_node_rect(node, offset=None):
+    offset_x, offset_y = get_parent_offset(node) if offset is None else offset
+    return (
+        get_left(node) + offset_x,
+        get_right(node) + offset_x,
+        get_bottom(node) + offset_y,
+        get_top(node) + offset_y,
+    )
 
-    return min_x, max_x, min_y, max_y
 
+def is_location_stale(socket, location, table=None):
+    x, y = location
+    if x == 0 and y == 0:
+        return True
 
-def get_bounds_midpoint(nodes):
-    nodes = tuple(n for n in nodes if n.bl_idname != "NodeFrame")
+    node = socket.node
+    if node.bl_idname != "NodeReroute" and node.dimensions.x == 0:
+        return True
 
-    min_x, max_x, min_y, max_y = get_bounds(nodes)
-    midpoint_x = 0.5 * (min_x + max_x)
-    midpoint_y = 0.5 * (min_y + max_y)
+    left, right, bottom, top = get_node_rect(node) if table is None else table.get_rect(node)
 
-    return midpoint_x, midpoint_y
+    return not ((left - stale_margin <= x <= right + stale_margin) and (bottom - stale_margin <= y <= top + stale_margin))
 
 
 class StructBase(ctypes.Structure):
@@ -213,4 +426,190 @@ def get_socket_location(sk):
     return Vector(BNodeSocket.get_fields(sk).runtime.contents.location[:]) / bpy.context.preferences.view.ui_scale
 
 
+# Number of rows that unlinked input sockets of a given type take up when their value is drawn
+socket_type_rows = {
+    "VECTOR": 4,
+}
+
+
+@lru_cache(maxsize=None)
+def get_layout_units(ui_scale):
+    # Mirrors NODE_DY, NODE_DYS and NODE_SOCKDY from Blender's node drawing code, in node-space units
+    widget_unit = round(20 * ui_scale) / ui_scale
+    return widget_unit, 0.5 * widget_unit, 0.1 * widget_unit
+
+
+def is_socket_drawn(sk):
+    return sk.enabled and not sk.hide
+
+
+def get_socket_rows(sk):
+    if sk.is_output or sk.is_linked or sk.hide_value:
+        return 1
+    return socket_type_rows.get(sk.type, 1)
+
+
+@lru_cache(maxsize=1024)
+def get_output_offsets(ui_scale, rows):
+    node_dy, node_dys, node_sockdy = get_layout_units(ui_scale)
+    offsets = []
+    cursor = node_dy + 0.5 * node_dys
+
+    for row_count in rows:
+        offsets.append(cursor + 0.5 * node_dy)
+        cursor += row_count * node_dy + node_sockdy
+
+    return tuple(offsets), cursor
+
+
+@lru_cache(maxsize=1024)
+def get_input_offsets(ui_scale, rows):
+    # Inputs are laid out below the node's buttons, whose height is unknown, so they are measured from the bottom
+    node_dy, node_dys, node_sockdy = get_layout_units(ui_scale)
+    offsets = []
+    cursor = node_dys
+
+    for row_count in reversed(rows):
+        cursor += row_count * node_dy
+        offsets.append(cursor - 0.5 * node_dy)
+        cursor += node_sockdy
+
+    return tuple(reversed(offsets)), cursor
+
+
+def estimate_socket_locations(node, ui_scale=None, offset=None):
+    """
+    Estimates where Blender draws each of the node's sockets, from the node's layout alone.
+    Returns a dictionary mapping the pointers of the drawn sockets to their location.
+    """
+
+    if ui_scale is None:
+        ui_scale = bpy.context.preferences.view.ui_scale
+
+    offset_x, offset_y = get_parent_offset(node) if offset is None else offset
+    left = get_left(node) + offset_x
+    right = get_right(node) + offset_x
+    locations = {}
+
+    if node.bl_idname == "NodeReroute":
+        location = Vector((left, node.location.y + offset_y))
+        for sk in (*node.inputs, *node.outputs):
+            locations[sk.as_pointer()] = location
+        return locations
+
+    inputs = tuple(sk for sk in node.inputs if is_socket_drawn(sk))
+    outputs = tuple(sk for sk in node.outputs if is_socket_drawn(sk))
+
+    if node.hide:
+        middle = get_middle(node) + offset_y
+        for sk in inputs:
+            locations[sk.as_pointer()] = Vector((left, middle))
+        for sk in outputs:
+            locations[sk.as_pointer()] = Vector((right, middle))
+        return locations
+
+    top = node.location.y + offset_y
+    # Offsets are cached by UI scale and socket layout, which nodes of the same type usually share
+    output_offsets, outputs_height = get_output_offsets(ui_scale, tuple(get_socket_rows(sk) for sk in outputs))
+    input_offsets, inputs_height = get_input_offsets(ui_scale, tuple(get_socket_rows(sk) for sk in inputs))
+
+    if node.dimensions.x > 0:
+        bottom = get_bottom(node) + offset_y
+    else:
+        # Nodes that were never drawn have no dimensions, so assume they have no buttons
+        bottom = top - outputs_height - inputs_height
+
+    for sk, offset in zip(outputs, output_offsets):
+        locations[sk.as_pointer()] = Vector((right, top - offset))
+    for sk, offset in zip(inputs, input_offsets):
+        locations[sk.as_pointer()] = Vector((left, bottom + offset))
+
+    return locations
+
+
+def is_collapsed(node):
+    return node.hide and node.bl_idname != "NodeReroute"
+
+
+def get_collapsed_anchors(node, offset=None):
+    """
+    Returns where the links of a collapsed node's inputs and outputs meet it, as (input anchor, output anchor).
+    """
+
+    offset_x, offset_y = get_parent_offset(node) if offset is None else offset
+    middle = get_middle(node) + offset_y
+
+    return (get_left(node) + offset_x, middle), (get_right(node) + offset_x, middle)
+
+
+class SocketLocator:
+    """
+    Locates sockets from either source, 'DRAWN' or 'ESTIMATED'. The estimated socket locations and
+    the link anchors of collapsed nodes are computed once per node, and looked up for each of its sockets.
+    Parent offsets are taken from the NodeTable if one is given.
+    """
+
+    __slots__ = ("source", "table", "estimates", "anchors")
+
+    def __init__(self, source, table=None):
+        self.source = source
+        self.table = table
+        self.estimates = {}
+        self.anchors = {}
+
+    def get_offset(self, node):
+        return get_parent_offset(node) if self.table is None else self.table.get_offset(node)
+
+    def estimate(self, sk):
+        node = sk.node
+        if (estimates := self.estimates.get(node.as_pointer())) is None:
+            estimates = self.estimates[node.as_pointer()] = estimate_socket_locations(node, offset=self.get_offset(node))
+
+        return estimates.get(sk.as_pointer(), Vector((0, 0)))
+
+    def get_anchors(self, node):
+        if (anchors := self.anchors.get(node.as_pointer())) is None:
+            anchors = self.anchors[node.as_pointer()] = get_collapsed_anchors(node, self.get_offset(node))
+
+        return anchors
+
+    def locate(self, sk):
+        if self.source == 'ESTIMATED':
+            return self.estimate(sk)
+        return get_socket_location(sk)
+
+    def resolve(self, sk):
+        """
+        Like locate(), except that sockets of collapsed nodes resolve to the node's link anchor,
+        and sockets that are not drawn at all resolve to None rather than to the origin.
+        """
+
+        if is_collapsed(sk.node):
+            return self.get_anchors(sk.node)[sk.is_output]
+        elif not is_socket_drawn(sk):
+            return None
+
+        return self.locate(sk)
+
+
+def compare_socket_estimates(table, indices):
+    """
+    Measures how far the estimated socket locations of the nodes at the given indices are from the ones drawn by Blender.
+    Returns the number of compared sockets, along with the maximum and mean deviation.
+    """
+
+    locator = SocketLocator('ESTIMATED', table)
+    deviations = []
+
+    for node in table.iter_nodes(indices):
+        for sk in (*node.inputs, *node.outputs):
+            if is_socket_drawn(sk):
+                deviations.append((locator.estimate(sk) - get_socket_location(sk)).length)
+
+    if not deviations:
+        return 0, 0.0, 0.0
+
+    return len(deviations), max(deviations), sum(deviations) / len(deviations)
+
+
 StructBase._init_structs()